@@ -0,0 +1,113 @@
+"""
+Compares the field drawn on the uniform grid with the field drawn on the
+adaptive quadtree samples for the same number of field evaluations.
+
+The fidelity of each sampling is measured on a fine reference grid: every
+reference point is represented by its nearest drawn vector, and the error
+is the angle between that vector and the exact field at the point. Points
+inside the charges, where no vector is drawn, are left out.
+
+    $ python benchmarks/adaptive_sampling.py --sizes 2 10 50 --spacing 20
+"""
+import argparse
+from time import perf_counter
+from numpy import clip, arccos, degrees, concatenate, einsum, percentile
+from numpy.linalg import norm
+from electripy.physics.solvers import DirectSolver
+from electripy.visualization.adaptive import QuadtreeSampler
+from common import random_scene, grid_points
+
+
+RESTRICTED_RADIUS = 40
+
+
+def outside_charges(points, positions):
+    distances = norm(points[:, None] - positions[None], axis=2)
+    return (distances > RESTRICTED_RADIUS).all(axis=1)
+
+
+def nearest(samples, points, chunk: int = 2048):
+    """Returns the index of the nearest sample of every point."""
+    indices = []
+    for start in range(0, len(points), chunk):
+        distances = norm(points[start : start + chunk, None] - samples[None], axis=2)
+        indices.append(distances.argmin(axis=1))
+    return concatenate(indices)
+
+
+def angular_error(samples, vectors, points, exact):
+    """Returns the mean, 95th and 99th percentile angle error in degrees."""
+    drawn = vectors[nearest(samples, points)]
+    cosines = einsum("ij,ij->i", drawn, exact) / (
+        norm(drawn, axis=1) * norm(exact, axis=1)
+    )
+    errors = degrees(arccos(clip(cosines, -1, 1)))
+    return errors.mean(), *percentile(errors, (95, 99))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2, 5, 10, 50, 200])
+    parser.add_argument("--width", type=int, default=750)
+    parser.add_argument("--height", type=int, default=750)
+    parser.add_argument("--spacing", type=int, default=20)
+    parser.add_argument("--reference-spacing", type=int, default=4)
+    parser.add_argument(
+        "--budget", type=int, help="adaptive evaluations (uniform grid size)"
+    )
+    args = parser.parse_args()
+
+    solver = DirectSolver("numpy")
+    uniform_points = grid_points(args.width, args.height, args.spacing)
+    budget = args.budget or len(uniform_points)
+    sampler = QuadtreeSampler(args.spacing // 2)
+    reference = grid_points(args.width, args.height, args.reference_spacing)
+    print(f"budget: {budget} evaluations")
+    print(
+        f"{'N':>6} {'sampling':>9} {'evaluations':>12} {'time (s)':>9}"
+        f" {'mean err':>9} {'p95 err':>9} {'p99 err':>9}"
+    )
+    for size in args.sizes:
+        positions, charges = random_scene(size, args.width, args.height)
+
+        def field(points):
+            return solver.electric_field(positions, charges, points)
+
+        points = reference[outside_charges(reference, positions)]
+        exact = field(points)
+
+        start = perf_counter()
+        uniform_vectors = field(uniform_points)
+        uniform_time = perf_counter() - start
+
+        shape = sampler.get_lattice_shape((args.width, args.height))
+        lattice = grid_points(
+            shape[0] * sampler.min_spacing,
+            shape[1] * sampler.min_spacing,
+            sampler.min_spacing,
+        )
+        restricted = ~outside_charges(lattice, positions).reshape(shape[::-1]).T
+
+        start = perf_counter()
+        samples, vectors = sampler.sample(
+            (args.width, args.height), field, budget, restricted
+        )
+        adaptive_time = perf_counter() - start
+
+        results = {
+            "uniform": (uniform_points, uniform_vectors, uniform_time),
+            "adaptive": (samples, vectors, adaptive_time),
+        }
+        for name, (samples, vectors, time) in results.items():
+            drawn = outside_charges(samples, positions)
+            mean, p95, p99 = angular_error(
+                samples[drawn], vectors[drawn], points, exact
+            )
+            print(
+                f"{size:>6} {name:>9} {len(samples):>12} {time:>9.4f}"
+                f" {mean:>9.2f} {p95:>9.2f} {p99:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
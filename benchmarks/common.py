@@ -0,0 +1,53 @@
+"""
+Helpers shared by the benchmark scripts. The scripts run from this
+directory (python benchmarks/<script>.py), so they import it as common.
+"""
+from time import perf_counter
+from numpy import arange, meshgrid, column_stack, random, sign
+from electripy.physics import constants
+from electripy.physics.charge_distribution import ChargeDistribution
+
+
+def best_time(function, repeat: int, setup=None) -> tuple[float, float]:
+    """
+    Returns the best and mean time of repeat calls to function. setup is
+    called before each of them and is not timed.
+    """
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = perf_counter()
+        function()
+        times.append(perf_counter() - start)
+    return min(times), sum(times) / len(times)
+
+
+def random_scene(size: int, width: int, height: int, seed: int = 0):
+    """
+    Returns the positions and charges of size protons and electrons spread
+    uniformly over a width x height window.
+    """
+    rng = random.default_rng(seed)
+    positions = rng.uniform((0, 0), (width, height), (size, 2))
+    charges = rng.choice([-1, 1], size) * constants.ELEMENTARY_CHARGE
+    return positions, charges
+
+
+def random_distribution(
+    size: int, width: int, height: int, seed: int = 0, backend="auto"
+) -> ChargeDistribution:
+    """
+    Returns a ChargeDistribution of the charges of random_scene, added at
+    once with their Proton and Electron kinds.
+    """
+    positions, charges = random_scene(size, width, height, seed)
+    distribution = ChargeDistribution(backend=backend)
+    distribution.add_charges(positions, charges, sign(charges))
+    return distribution
+
+
+def grid_points(width: int, height: int, spacing: int):
+    """Returns the (M, 2) points of a grid of the given spacing."""
+    xs, ys = meshgrid(arange(0, width, spacing), arange(0, height, spacing))
+    return column_stack((xs.ravel(), ys.ravel())).astype(float)
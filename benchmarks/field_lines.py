@@ -0,0 +1,54 @@
+"""
+Times the tracing of the field lines of random scenes of growing size.
+
+Every scene is traced once to warm up the backend (calibration and JIT
+compilation) and then --repeat times, and the best time is reported with
+the number of lines drawn, the number of lockstep steps (each one three
+calls to the batched field function, after a first call for the starting
+points) and the points of the lines.
+
+    $ python benchmarks/field_lines.py --sizes 2 20 100 300
+"""
+import argparse
+from electripy.visualization.field_lines import FieldLineTracer
+from common import best_time, random_distribution
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2, 20, 100, 300])
+    parser.add_argument("--window", type=int, nargs=2, default=(750, 750))
+    parser.add_argument("--lines-per-charge", type=int, default=12)
+    parser.add_argument("--max-lines", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    tracer = FieldLineTracer(args.lines_per_charge, args.max_lines)
+    print(f"{'N':>6} {'lines':>6} {'steps':>11} {'points':>8} {'trace (ms)':>11}")
+    for size in args.sizes:
+        scene = random_distribution(size, *args.window)
+        calls = 0
+
+        def field(points):
+            nonlocal calls
+            calls += 1
+            return scene.get_electric_field_batch(points)
+
+        def trace():
+            return tracer.trace(scene.positions, scene.charges, field, args.window)
+
+        def reset_calls():
+            nonlocal calls
+            calls = 0
+
+        lines = trace()
+        best, _ = best_time(trace, args.repeat, reset_calls)
+        points = sum(len(line) for line in lines)
+        print(
+            f"{size:>6} {len(lines):>6} {(calls - 1) // 3:>11} {points:>8}"
+            f" {best * 1000:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Compares the FMM solver against direct summation for a growing number of
+charges and prints the size from which the FMM stays faster.
+
+Two workloads are measured: the electric field on a rendering grid (one
+point every `spacing` pixels of a `width` x `height` window) and the
+forces on every charge. Direct summation runs on a fixed backend (numpy by
+default), so that the timings do not include the calibration of the auto
+backend, and every function is called once before it is timed.
+
+    $ python benchmarks/fmm_scaling.py --sizes 100 1000 10000 --order 12
+"""
+import argparse
+from numpy.linalg import norm
+from electripy.physics.solvers import DirectSolver
+from electripy.physics.fmm import FMMSolver
+from common import best_time, random_scene, grid_points
+
+
+def relative_error(approximated, exact) -> float:
+    return float((norm(approximated - exact, axis=1) / norm(exact, axis=1)).max())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[100, 300, 1000, 3000, 10000, 30000]
+    )
+    parser.add_argument("--order", type=int, default=FMMSolver.DEFAULT_ORDER)
+    parser.add_argument("--width", type=int, default=750)
+    parser.add_argument("--height", type=int, default=750)
+    parser.add_argument("--spacing", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--backend", default="numpy")
+    args = parser.parse_args()
+
+    direct = DirectSolver(backend=args.backend)
+    fmm = FMMSolver(order=args.order)
+    points = grid_points(args.width, args.height, args.spacing)
+    # The last size at which direct summation was faster.
+    last_direct_win = {"field": None, "forces": None}
+
+    print(
+        f"grid points: {len(points)}, order: {args.order},"
+        f" direct backend: {args.backend}"
+    )
+    print(
+        f"{'N':>8} {'workload':>8} {'direct (s)':>12} {'fmm (s)':>12}"
+        f" {'speedup':>8} {'max rel err':>12}"
+    )
+    for size in args.sizes:
+        positions, charges = random_scene(size, args.width, args.height)
+        workloads = {
+            "field": (
+                lambda: direct.electric_field(positions, charges, points),
+                lambda: fmm.electric_field(positions, charges, points),
+            ),
+            "forces": (
+                lambda: direct.electric_forces(positions, charges),
+                lambda: fmm.electric_forces(positions, charges),
+            ),
+        }
+        for name, (direct_function, fmm_function) in workloads.items():
+            # The first calls warm up the solvers and are not timed.
+            error = relative_error(fmm_function(), direct_function())
+            direct_time, _ = best_time(direct_function, args.repeat)
+            fmm_time, _ = best_time(fmm_function, args.repeat)
+            print(
+                f"{size:>8} {name:>8} {direct_time:>12.4f} {fmm_time:>12.4f}"
+                f" {direct_time / fmm_time:>8.2f} {error:>12.2e}"
+            )
+            if fmm_time >= direct_time:
+                last_direct_win[name] = size
+
+    sizes = list(args.sizes)
+    for name, size in last_direct_win.items():
+        if size is None:
+            print(f"{name}: FMM was faster for every size")
+        elif size == sizes[-1]:
+            print(f"{name}: direct summation was faster at the largest size")
+        else:
+            crossover = sizes[sizes.index(size) + 1]
+            print(
+                f"{name}: FMM stays faster than direct summation from N = {crossover}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Compares how fast scenes of growing size are saved and loaded in each
+scene format, against adding the charges one PointCharge at a time.
+
+For every size a random scene is written as .npz, .txt and .csv, and each
+file is loaded into a new ChargeDistribution with load_scene, which streams
+it in chunks straight into the charge arrays. The "objects" row builds a
+Proton or Electron per charge and adds it with add_charge, which is what
+loading a scene click by click costs. Times are the best of --repeat runs.
+
+    $ python benchmarks/scene_io.py --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import tempfile
+from electripy.physics.charges import Proton, Electron
+from electripy.physics.charge_distribution import ChargeDistribution
+from electripy.physics.scenes import save_scene, load_scene
+from common import best_time, random_distribution
+
+
+FORMATS = (".npz", ".txt", ".csv")
+
+
+def add_objects(scene: ChargeDistribution) -> None:
+    distribution = ChargeDistribution(backend="numpy")
+    for position, kind in zip(scene.positions, scene.kinds.tolist()):
+        distribution.add_charge((Proton if kind == Proton.KIND else Electron)(position))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--objects-limit",
+        type=int,
+        default=100000,
+        help="largest size timed with one add_charge per charge",
+    )
+    args = parser.parse_args()
+
+    print(
+        f"{'N':>9} {'format':>8} {'size (MB)':>10} {'save (s)':>9}"
+        f" {'load (s)':>9} {'charges/s':>11} {'MB/s':>8}"
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            scene = random_distribution(size, 1000, 1000, backend="numpy")
+            for suffix in FORMATS:
+                path = os.path.join(directory, f"scene{suffix}")
+                save, _ = best_time(lambda: save_scene(scene, path), args.repeat)
+                load, _ = best_time(
+                    lambda: load_scene(path, backend="numpy"), args.repeat
+                )
+                megabytes = os.path.getsize(path) / 2**20
+                print(
+                    f"{size:>9} {suffix:>8} {megabytes:>10.2f} {save:>9.4f}"
+                    f" {load:>9.4f} {size / load:>11.3g} {megabytes / load:>8.1f}"
+                )
+            if size <= args.objects_limit:
+                load, _ = best_time(lambda: add_objects(scene), args.repeat)
+                print(
+                    f"{size:>9} {'objects':>8} {'':>10} {'':>9}"
+                    f" {load:>9.4f} {size / load:>11.3g} {'':>8}"
+                )
+
+
+if __name__ == "__main__":
+    main()
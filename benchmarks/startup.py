@@ -0,0 +1,97 @@
+"""
+Measures how long `python -m electripy` takes to draw its first frame.
+
+The simulation is started with --frames 1, so it quits right after the
+first frame is on screen, and the wall time of the whole process is taken
+as the time to first frame. The first run starts with an empty cache
+directory (XDG_CACHE_HOME is pointed to a temporary one), so it pays for
+resolving the system fonts; the next runs reuse that cache, like every
+session after the first one does. A last run under -X importtime reports
+how much of the startup goes to importing the modules. The script exits
+with status 1 if the median warm startup exceeds --max-seconds.
+
+    $ python benchmarks/startup.py --repeat 10 --max-seconds 1.5
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from statistics import median
+from time import perf_counter
+
+
+COMMAND = [sys.executable, "-m", "electripy", "--frames", "1"]
+IMPORT = "electripy.visualization.simulation"
+
+
+def run(environment: dict, options: list = ()) -> tuple[float, str]:
+    """Runs the simulation once and returns its wall time and its stderr."""
+    start = perf_counter()
+    process = subprocess.run(
+        [COMMAND[0], *options, *COMMAND[1:]],
+        env=environment,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    return perf_counter() - start, process.stderr
+
+
+def import_times(stderr: str) -> list[tuple[float, float, str]]:
+    """
+    Returns the (self, cumulative, module) times in seconds of the -X
+    importtime report in stderr.
+    """
+    times = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:") :].split("|")
+        times.append((int(own) / 1e6, int(cumulative) / 1e6, name.strip()))
+    return times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5, help="warm runs")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports shown")
+    parser.add_argument(
+        "--max-seconds",
+        type=float,
+        help="median warm startup above which the script fails",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache:
+        environment = dict(
+            os.environ,
+            SDL_VIDEODRIVER=os.environ.get("SDL_VIDEODRIVER", "dummy"),
+            SDL_AUDIODRIVER=os.environ.get("SDL_AUDIODRIVER", "dummy"),
+            PYGAME_HIDE_SUPPORT_PROMPT="1",
+            XDG_CACHE_HOME=cache,
+        )
+        cold, _ = run(environment)
+        warm = [run(environment)[0] for _ in range(args.repeat)]
+        _, stderr = run(environment, ["-X", "importtime"])
+
+    print(f"cold startup: {cold:.3f} s")
+    print(
+        f"warm startup: {median(warm):.3f} s median, {min(warm):.3f} s best"
+        f" ({args.repeat} runs)"
+    )
+    times = import_times(stderr)
+    total = next((cumulative for _, cumulative, name in times if name == IMPORT), 0)
+    print(f"import {IMPORT}: {total:.3f} s")
+    print(f"\n{'self (s)':>9} {'cumul. (s)':>10}  module")
+    for own, cumulative, name in sorted(times, reverse=True)[: args.top]:
+        print(f"{own:>9.4f} {cumulative:>10.4f}  {name}")
+
+    if args.max_seconds is not None and median(warm) > args.max_seconds:
+        print(f"\nwarm startup exceeds {args.max_seconds:.3f} s", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+"""
+Runs the benchmark suite of the physics kernels and the rendering paths and
+reports how each benchmark scales with the size of its problem.
+
+Every benchmark is timed at growing sizes (number of charges or number of
+field grid points). The scaling exponent of each one is the slope of the
+least squares fit of log(time) against log(size), and it is compared with
+the exponent the benchmark is expected to have: a benchmark whose exponent
+exceeds the expected one by more than the tolerance is reported as a
+regression and makes the script exit with status 1. Results are written as
+JSON and the summary is printed to stderr. Rendering runs under the SDL
+dummy video driver, so the suite works on a headless machine.
+
+    $ python benchmarks/suite.py --output results.json
+    $ python benchmarks/suite.py --quick --only forces field.draw
+"""
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import json
+import platform
+import sys
+import numpy
+import pygame
+from numpy import random, polyfit, log
+from electripy.physics.charges import Proton, Electron
+from electripy.physics.charge_distribution import ChargeDistribution
+from electripy.physics.solvers import DirectSolver
+from electripy.visualization import settings, colors
+from electripy.visualization.screen import Screen, Field
+from common import best_time, random_scene
+
+
+SIZES = {
+    "add_charge": [2000, 4000, 8000, 16000, 32000],
+    "remove_charge": [2000, 4000, 8000, 16000, 32000],
+    "forces": [250, 500, 1000, 2000, 4000],
+    "refresh_screen": [500, 1000, 2000, 4000, 8000],
+}
+QUICK_SIZES = {
+    "add_charge": [1000, 2000, 4000],
+    "remove_charge": [1000, 2000, 4000],
+    "forces": [200, 400, 800],
+    "refresh_screen": [1000, 2000, 4000],
+}
+WINDOW_SIZES = [(400, 400), (750, 750), (1280, 720), (1920, 1080)]
+QUICK_WINDOW_SIZES = [(400, 400), (750, 750)]
+SPACES_BETWEEN_VECTORS = [10, 20, 40]
+EXPECTED_EXPONENTS = {
+    "add_charge": 1.0,
+    "remove_charge": 1.0,
+    "forces": 2.0,
+    "field.get_field": 1.0,
+    "field.draw": 1.0,
+    "refresh_screen": 1.0,
+}
+
+
+def random_charges(size: int, width: int, height: int, seed: int = 0) -> list:
+    positions, charges = random_scene(size, width, height, seed)
+    return [
+        Proton(position) if charge > 0 else Electron(position)
+        for position, charge in zip(positions, charges)
+    ]
+
+
+def bench_add_charge(size: int, args) -> tuple[float, float]:
+    charges = random_charges(size, args.width, args.height)
+    distributions = []
+
+    def setup():
+        distributions.append(ChargeDistribution(DirectSolver(args.backend)))
+
+    def run():
+        add_charge = distributions[-1].add_charge
+        for charge in charges:
+            add_charge(charge)
+
+    return best_time(run, args.repeat, setup)
+
+
+def bench_remove_charge(size: int, args) -> tuple[float, float]:
+    charges = random_charges(size, args.width, args.height)
+    order = random.default_rng(1).permutation(size).tolist()
+    distributions = []
+
+    def setup():
+        distribution = ChargeDistribution(DirectSolver(args.backend))
+        for charge in charges:
+            distribution.add_charge(charge)
+        distributions.append(distribution)
+
+    def run():
+        remove_charge = distributions[-1].remove_charge
+        for index in order:
+            remove_charge(charges[index])
+
+    return best_time(run, args.repeat, setup)
+
+
+def bench_forces(size: int, args) -> tuple[float, float]:
+    distribution = ChargeDistribution(DirectSolver(args.backend))
+    for charge in random_charges(size, args.width, args.height):
+        distribution.add_charge(charge)
+    distribution.get_electric_forces()
+    return best_time(distribution.get_electric_forces, args.repeat)
+
+
+def make_field(window_size: tuple, space_between_vectors: int, args):
+    distribution = ChargeDistribution(DirectSolver(args.backend))
+    positions, charges = random_scene(args.field_charges, *window_size)
+    distribution.add_charges(positions, charges)
+    window = pygame.Surface(window_size)
+    field = Field(
+        window,
+        settings.DEFAULT_EF_BRIGHTNESS,
+        distribution.get_electric_field_batch,
+        space_between_vectors,
+        distribution.backend,
+    )
+    return field, distribution.positions
+
+
+def bench_field_get_field(field: Field, restricted_points, args):
+    """
+    Times computing the field grid from scratch. The size is the number of
+    grid points.
+    """
+    best, mean = best_time(
+        lambda: field._get_field(restricted_points), args.repeat, field.invalidate
+    )
+    return len(field._get_grid_points()), best, mean
+
+
+def bench_field_draw(field: Field, restricted_points, args):
+    """
+    Times drawing the cached field. The size is the number of arrows drawn,
+    since the points covered by charges are left out.
+    """
+    positions, _ = field._get_field(restricted_points)
+    field.draw(restricted_points)
+    best, mean = best_time(lambda: field.draw(restricted_points), args.repeat)
+    return len(positions), best, mean
+
+
+def bench_refresh_screen(size: int, args) -> tuple[float, float]:
+    """
+    Times a frame of the simulation: the field image is already drawn, so
+    what grows with size is drawing the charges.
+    """
+    screen = Screen(settings.WINDOW_TITLE, args.height, args.width, False, colors.BLACK)
+    positions, charges = random_scene(size, args.width, args.height)
+    screen.charge_distribution.add_charges(positions, charges)
+    for field in screen._fields():
+        field.invalidate()
+    screen.refresh_screen()
+    return best_time(screen.refresh_screen, args.repeat)
+
+
+def scaling_exponent(sizes: list, times: list) -> float:
+    """Returns the slope of log(times) as a function of log(sizes)."""
+    if len(set(sizes)) < 2:
+        return float("nan")
+    slope, _ = polyfit(log(sizes), log(times), 1)
+    return float(slope)
+
+
+def run_suite(args) -> list[dict]:
+    sizes = QUICK_SIZES if args.quick else SIZES
+    window_sizes = QUICK_WINDOW_SIZES if args.quick else WINDOW_SIZES
+    scene_benchmarks = {
+        "add_charge": bench_add_charge,
+        "remove_charge": bench_remove_charge,
+        "forces": bench_forces,
+        "refresh_screen": bench_refresh_screen,
+    }
+    field_benchmarks = {
+        "field.get_field": bench_field_get_field,
+        "field.draw": bench_field_draw,
+    }
+
+    results = []
+    for name, bench in scene_benchmarks.items():
+        if args.only and name not in args.only:
+            continue
+        for size in sizes[name]:
+            best, mean = bench(size, args)
+            results.append(
+                {"benchmark": name, "size": size, "best": best, "mean": mean}
+            )
+            log_result(results[-1])
+
+    for window_size in window_sizes:
+        for space_between_vectors in SPACES_BETWEEN_VECTORS:
+            field, restricted_points = make_field(
+                window_size, space_between_vectors, args
+            )
+            for name, bench in field_benchmarks.items():
+                if args.only and name not in args.only:
+                    continue
+                size, best, mean = bench(field, restricted_points, args)
+                results.append(
+                    {
+                        "benchmark": name,
+                        "size": size,
+                        "window_size": list(window_size),
+                        "space_between_vectors": space_between_vectors,
+                        "best": best,
+                        "mean": mean,
+                    }
+                )
+                log_result(results[-1])
+    return results
+
+
+def summarize(results: list[dict], tolerance: float) -> list[dict]:
+    summary = []
+    for name, expected in EXPECTED_EXPONENTS.items():
+        rows = sorted(
+            (row for row in results if row["benchmark"] == name),
+            key=lambda row: row["size"],
+        )
+        if not rows:
+            continue
+        exponent = scaling_exponent(
+            [row["size"] for row in rows], [row["best"] for row in rows]
+        )
+        summary.append(
+            {
+                "benchmark": name,
+                "exponent": exponent,
+                "expected_exponent": expected,
+                "regression": exponent > expected + tolerance,
+            }
+        )
+    return summary
+
+
+def log_result(result: dict) -> None:
+    details = ""
+    if "window_size" in result:
+        width, height = result["window_size"]
+        details = f" ({width}x{height}, spacing {result['space_between_vectors']})"
+    print(
+        f"{result['benchmark']:>16} {result['size']:>8} {result['best']:>10.5f} s"
+        f"{details}",
+        file=sys.stderr,
+    )
+
+
+def machine_info() -> dict:
+    return {
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "pygame": pygame.version.ver,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--output", help="JSON output file (stdout by default)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="use smaller sizes")
+    parser.add_argument(
+        "--only", nargs="+", choices=list(EXPECTED_EXPONENTS), help="benchmarks"
+    )
+    parser.add_argument("--backend", default="numpy", help="direct solver backend")
+    parser.add_argument("--field-charges", type=int, default=100)
+    parser.add_argument("--width", type=int, default=settings.WIDTH)
+    parser.add_argument("--height", type=int, default=settings.HEIGHT)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.5,
+        help="exponent excess over the expected one reported as a regression",
+    )
+    args = parser.parse_args()
+
+    # Field grids computed in the background would run during the timings.
+    settings.FIELD_REFINEMENT_LEVELS = None
+    pygame.init()
+    pygame.display.set_mode((args.width, args.height))
+    results = run_suite(args)
+    summary = summarize(results, args.tolerance)
+    pygame.quit()
+
+    print(f"\n{'benchmark':>16} {'exponent':>9} {'expected':>9}", file=sys.stderr)
+    for row in summary:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(
+            f"{row['benchmark']:>16} {row['exponent']:>9.2f}"
+            f" {row['expected_exponent']:>9.2f}{flag}",
+            file=sys.stderr,
+        )
+
+    report = {
+        "machine": machine_info(),
+        "options": vars(args),
+        "results": results,
+        "scaling": summary,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if any(row["regression"] for row in summary):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,94 @@
-from electripy.visualization import simulation
+import argparse
+import sys
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m electripy", description="ElectriPy electrostatic simulator"
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="DIRECTORY",
+        nargs="?",
+        const="electripy-profile",
+        help="profile the session with cProfile and tracemalloc and write the "
+        "reports and the frame times to DIRECTORY (default: electripy-profile)",
+    )
+    parser.add_argument(
+        "--frames",
+        metavar="N",
+        type=int,
+        help="quit after N frames (used to measure the startup time)",
+    )
+    parser.add_argument(
+        "--scene", help="start with the charges of a scene file (.npz, .txt, .csv)"
+    )
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    export = commands.add_parser(
+        "export",
+        help="write the field or the potential of a scene to a .npy file",
+        description="Computes the field or the potential of a scene on a grid, "
+        "tile by tile, without opening a window. An interrupted export run "
+        "again with the same arguments resumes from the last tile written.",
+    )
+    export.add_argument("scene", help="scene file (.npz, .txt, .csv)")
+    export.add_argument("output", help="output file (.npy)")
+    export.add_argument("--width", type=int, required=True, help="grid columns")
+    export.add_argument("--height", type=int, required=True, help="grid rows")
+    export.add_argument("--quantity", choices=("field", "potential"), default="field")
+    export.add_argument(
+        "--spacing", type=float, default=1.0, help="distance between grid points"
+    )
+    export.add_argument(
+        "--origin",
+        type=float,
+        nargs=2,
+        default=(0.0, 0.0),
+        metavar=("X", "Y"),
+        help="position of the first grid point",
+    )
+    export.add_argument("--tile-size", type=int, default=512)
+    export.add_argument(
+        "--dtype",
+        choices=("float64", "float32"),
+        default="float64",
+        help="precision of the computation and of the output",
+    )
+    export.add_argument("--backend", default="auto", help="field backend")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_grid(args)
+    else:
+        from electripy.visualization import simulation
+
+        simulation.main(args.profile, args.frames, args.scene)
+
+
+def export_grid(args: argparse.Namespace) -> None:
+    from electripy.physics.backends import get_backend
+    from electripy.physics.scenes import load_scene
+    from electripy.physics.export import GridExport
+
+    backend = get_backend(args.backend, dtype=args.dtype)
+    grid = GridExport(
+        load_scene(args.scene, backend=backend),
+        args.output,
+        args.width,
+        args.height,
+        args.quantity,
+        args.spacing,
+        args.origin,
+        args.tile_size,
+        args.dtype,
+    )
+
+    def report(done: int, tiles: int) -> None:
+        print(f"\rtile {done}/{tiles}", end="", file=sys.stderr, flush=True)
+
+    grid.run(report)
+    print(file=sys.stderr)
 
 
 if __name__ == "__main__":
-    simulation.main()
+    main()
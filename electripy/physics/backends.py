@@ -0,0 +1,465 @@
+from numpy import ndarray, asarray, zeros, random, sqrt, dtype as data_type
+from importlib.util import find_spec
+from time import perf_counter
+from threading import Thread, Lock, Event
+from queue import SimpleQueue
+from electripy.physics import constants, kernels
+from electripy.physics.charges import PointCharge
+
+
+class PythonBackend:
+    """
+    Reference backend: evaluates every pair of charge and point with
+    PointCharge.electric_field, one at a time. It is only competitive for a
+    handful of charges, so AutoBackend never tries it on problems with more
+    than MAX_PAIRS pairs. It always computes in float64 and only converts
+    its results to dtype.
+    """
+
+    MAX_PAIRS = 4096
+
+    def __init__(self, dtype="float64") -> None:
+        kernels.get_charge_unit(dtype)
+        self.dtype = data_type(dtype)
+
+    @staticmethod
+    def is_available() -> bool:
+        return True
+
+    def electric_field(
+        self, positions: ndarray, charges: ndarray, points: ndarray
+    ) -> ndarray:
+        sources = _point_charges(positions, charges)
+        points = asarray(points, dtype=float).reshape(-1, 2)
+        field = zeros(points.shape)
+        for i, point in enumerate(points):
+            for source in sources:
+                if (source.position != point).any():
+                    field[i] += source.electric_field(point)
+        return field.astype(self.dtype, copy=False)
+
+    def electric_forces(self, positions: ndarray, charges: ndarray) -> ndarray:
+        sources = _point_charges(positions, charges)
+        forces = zeros((len(sources), 2))
+        for i, target in enumerate(sources):
+            for source in sources:
+                if source is not target and (source.position != target.position).any():
+                    forces[i] += target.charge * source.electric_field(target.position)
+        return forces.astype(self.dtype, copy=False)
+
+    def electric_potential(
+        self, positions: ndarray, charges: ndarray, points: ndarray
+    ) -> ndarray:
+        sources = _point_charges(positions, charges)
+        points = asarray(points, dtype=float).reshape(-1, 2)
+        potential = zeros(len(points))
+        for i, point in enumerate(points):
+            for source in sources:
+                if (source.position != point).any():
+                    potential[i] += source.electric_potential(point)
+        return potential.astype(self.dtype, copy=False)
+
+
+class NumpyBackend:
+    """
+    Vectorized backend built on the chunked kernels of
+    electripy.physics.kernels.
+    """
+
+    MAX_PAIRS = None
+
+    def __init__(
+        self,
+        chunk_size: int = kernels.DEFAULT_CHUNK_SIZE,
+        block_size: int = kernels.DEFAULT_BLOCK_SIZE,
+        dtype="float64",
+    ) -> None:
+        kernels.get_charge_unit(dtype)
+        self.chunk_size = chunk_size
+        self.block_size = block_size
+        self.dtype = data_type(dtype)
+
+    @staticmethod
+    def is_available() -> bool:
+        return True
+
+    def electric_field(
+        self, positions: ndarray, charges: ndarray, points: ndarray
+    ) -> ndarray:
+        return kernels.electric_field(
+            positions, charges, points, self.chunk_size, self.dtype
+        )
+
+    def electric_forces(self, positions: ndarray, charges: ndarray) -> ndarray:
+        return kernels.electric_forces(
+            positions, charges, self.block_size, dtype=self.dtype
+        )
+
+    def electric_potential(
+        self, positions: ndarray, charges: ndarray, points: ndarray
+    ) -> ndarray:
+        return kernels.electric_potential(
+            positions, charges, points, self.chunk_size, self.dtype
+        )
+
+
+class NumbaBackend:
+    """
+    JIT compiled backend, only available when numba is installed. The loops
+    are compiled the first time the backend is used and run in parallel
+    over the points (or the charges, for forces) without building any
+    intermediate array. Sums are accumulated in float64 whatever dtype is.
+    """
+
+    MAX_PAIRS = None
+    _compiled = None
+
+    def __init__(self, dtype="float64") -> None:
+        if not NumbaBackend.is_available():
+            raise ImportError("the numba backend requires numba to be installed")
+        kernels.get_charge_unit(dtype)
+        self.dtype = data_type(dtype)
+
+    @staticmethod
+    def is_available() -> bool:
+        return find_spec("numba") is not None
+
+    @staticmethod
+    def start_threads() -> None:
+        """
+        Starts the threads the parallel loops run on. It must be called on
+        the main thread before the backend is used on any other: the TBB
+        threading layer of numba hangs the interpreter at exit when its
+        threads were started from another thread.
+        """
+        import numba
+
+        numba.get_num_threads()
+
+    def electric_field(
+        self, positions: ndarray, charges: ndarray, points: ndarray
+    ) -> ndarray:
+        positions, charges, unit = kernels.to_precision(positions, charges, self.dtype)
+        points = asarray(points, dtype=self.dtype).reshape(-1, 2)
+        field, _, _ = NumbaBackend._compile()
+        return field(positions, charges, points, constants.COULOMB_CONST * unit)
+
+    def electric_forces(self, positions: ndarray, charges: ndarray) -> ndarray:
+        positions, charges, unit = kernels.to_precision(positions, charges, self.dtype)
+        _, forces, _ = NumbaBackend._compile()
+        return forces(positions, charges, constants.COULOMB_CONST * unit * unit)
+
+    def electric_potential(
+        self, positions: ndarray, charges: ndarray, points: ndarray
+    ) -> ndarray:
+        positions, charges, unit = kernels.to_precision(positions, charges, self.dtype)
+        points = asarray(points, dtype=self.dtype).reshape(-1, 2)
+        _, _, potential = NumbaBackend._compile()
+        return potential(positions, charges, points, constants.COULOMB_CONST * unit)
+
+    @staticmethod
+    def _compile() -> tuple:
+        if NumbaBackend._compiled is not None:
+            return NumbaBackend._compiled
+        from numba import njit, prange
+
+        @njit(parallel=True, cache=True)
+        def field(positions, charges, points, coulomb_const):
+            result = zeros(points.shape, points.dtype)
+            for i in prange(len(points)):
+                field_x = 0.0
+                field_y = 0.0
+                for j in range(len(charges)):
+                    r_x = points[i, 0] - positions[j, 0]
+                    r_y = points[i, 1] - positions[j, 1]
+                    r_squared = r_x * r_x + r_y * r_y
+                    if r_squared == 0:
+                        continue
+                    weight = charges[j] / (r_squared * sqrt(r_squared))
+                    field_x += weight * r_x
+                    field_y += weight * r_y
+                result[i, 0] = coulomb_const * field_x
+                result[i, 1] = coulomb_const * field_y
+            return result
+
+        @njit(parallel=True, cache=True)
+        def forces(positions, charges, coulomb_const):
+            result = zeros(positions.shape, positions.dtype)
+            for i in prange(len(charges)):
+                field_x = 0.0
+                field_y = 0.0
+                for j in range(len(charges)):
+                    r_x = positions[i, 0] - positions[j, 0]
+                    r_y = positions[i, 1] - positions[j, 1]
+                    r_squared = r_x * r_x + r_y * r_y
+                    if i == j or r_squared == 0:
+                        continue
+                    weight = charges[j] / (r_squared * sqrt(r_squared))
+                    field_x += weight * r_x
+                    field_y += weight * r_y
+                result[i, 0] = coulomb_const * field_x * charges[i]
+                result[i, 1] = coulomb_const * field_y * charges[i]
+            return result
+
+        @njit(parallel=True, cache=True)
+        def potential(positions, charges, points, coulomb_const):
+            result = zeros(len(points), points.dtype)
+            for i in prange(len(points)):
+                total = 0.0
+                for j in range(len(charges)):
+                    r_x = points[i, 0] - positions[j, 0]
+                    r_y = points[i, 1] - positions[j, 1]
+                    r_squared = r_x * r_x + r_y * r_y
+                    if r_squared == 0:
+                        continue
+                    total += charges[j] / sqrt(r_squared)
+                result[i] = coulomb_const * total
+            return result
+
+        NumbaBackend._compiled = (field, forces, potential)
+        return NumbaBackend._compiled
+
+
+# A backend is any object with the following methods:
+#
+#     electric_field(positions, charges, points) -> (M, 2) array
+#     electric_forces(positions, charges) -> (N, 2) array
+#     electric_potential(positions, charges, points) -> (M,) array
+#
+# The field on a grid is the field on its points, and the field at a single
+# point is the field on a (1, 2) array of points.
+BACKENDS = {
+    "python": PythonBackend,
+    "numpy": NumpyBackend,
+    "numba": NumbaBackend,
+}
+
+
+class AutoBackend:
+    CALIBRATION_PAIRS = 2**16
+    CALIBRATION_REPEAT = 3
+    EMPTY_BACKEND = "numpy"
+    _choices = {}
+    _queued = set()
+    _queue = None
+    _lock = Lock()
+    _started = Event()
+
+    def __init__(
+        self, candidates: list[str] = None, dtype="float64", background=False
+    ) -> None:
+        """
+        Runs every kernel on the fastest of the candidate backends (all the
+        available ones by default) for the size of the problem.
+
+        The first time a kernel is called for a size bucket (the bit length
+        of the number of charges and points) each candidate is timed on a
+        random problem of that size, and the fastest one is used from then on.
+        Calibration results are shared by every AutoBackend of the process
+        with the same candidates and dtype.
+
+        Calibrating takes up to a few seconds when it compiles the numba
+        kernels. With background set, size buckets are calibrated one at a
+        time on a background thread instead, and the kernels of a bucket
+        not calibrated yet run on the backend used last (EMPTY_BACKEND at
+        first), so an interactive caller never waits for calibration. The
+        background calibrations only start once the main thread has called
+        start_background_calibration.
+        """
+        self.candidates = tuple(candidates or available_backends())
+        self.dtype = data_type(dtype)
+        self.background = background
+        self.backends = {
+            name: BACKENDS[name](dtype=self.dtype) for name in self.candidates
+        }
+        if AutoBackend.EMPTY_BACKEND in self.backends:
+            self._current = AutoBackend.EMPTY_BACKEND
+        else:
+            self._current = self.candidates[0]
+
+    def select(self, kernel: str, charges_count: int, points_count: int):
+        """
+        Returns the fastest backend to run kernel (for instance
+        "electric_field") on charges_count charges and points_count points.
+        Empty problems are not calibrated: they run on EMPTY_BACKEND, or the
+        first candidate if it is not one of them.
+        """
+        if not charges_count or not points_count:
+            if AutoBackend.EMPTY_BACKEND in self.backends:
+                return self.backends[AutoBackend.EMPTY_BACKEND]
+            return self.backends[self.candidates[0]]
+        key = (
+            self.candidates,
+            self.dtype.name,
+            kernel,
+            charges_count.bit_length(),
+            points_count.bit_length(),
+        )
+        if key not in AutoBackend._choices:
+            if self.background:
+                self._calibrate_later(key, kernel, charges_count, points_count)
+                return self._get_fallback(charges_count * points_count)
+            self._calibrate(key, kernel, charges_count, points_count)
+        self._current = AutoBackend._choices[key]
+        return self.backends[self._current]
+
+    def _calibrate(
+        self, key: tuple, kernel: str, charges_count: int, points_count: int
+    ) -> None:
+        timings = calibrate(self.backends, kernel, charges_count, points_count)
+        AutoBackend._choices[key] = min(timings, key=timings.get)
+
+    def _calibrate_later(
+        self, key: tuple, kernel: str, charges_count: int, points_count: int
+    ) -> None:
+        """
+        Queues the calibration of a size bucket for the background thread,
+        starting the thread the first time.
+        """
+        with AutoBackend._lock:
+            if key in AutoBackend._queued:
+                return
+            AutoBackend._queued.add(key)
+            if AutoBackend._queue is None:
+                AutoBackend._queue = SimpleQueue()
+                Thread(target=AutoBackend._run_calibrations, daemon=True).start()
+        AutoBackend._queue.put((self, key, kernel, charges_count, points_count))
+
+    @staticmethod
+    def start_background_calibration() -> None:
+        """
+        Lets the background thread calibrate the size buckets queued so far
+        and from then on. It starts the threads of the numba backend, so it
+        must be called on the main thread, and it takes as long as importing
+        numba.
+        """
+        if NumbaBackend.is_available():
+            NumbaBackend.start_threads()
+        AutoBackend._started.set()
+
+    @staticmethod
+    def _run_calibrations() -> None:
+        AutoBackend._started.wait()
+        while True:
+            backend, key, kernel, charges_count, points_count = AutoBackend._queue.get()
+            try:
+                backend._calibrate(key, kernel, charges_count, points_count)
+            except Exception:
+                # A backend that cannot run keeps the bucket on the fallback
+                # rather than calibrating it again on every call.
+                AutoBackend._choices[key] = backend._get_fallback_name(
+                    charges_count * points_count
+                )
+
+    def _get_fallback_name(self, pairs: int) -> str:
+        """
+        Returns the backend used last, or EMPTY_BACKEND if that one does
+        not take problems of pairs pairs of charge and point.
+        """
+        limit = self.backends[self._current].MAX_PAIRS
+        if limit is None or pairs <= limit:
+            return self._current
+        if AutoBackend.EMPTY_BACKEND in self.backends:
+            return AutoBackend.EMPTY_BACKEND
+        return self._current
+
+    def _get_fallback(self, pairs: int):
+        return self.backends[self._get_fallback_name(pairs)]
+
+    def electric_field(
+        self, positions: ndarray, charges: ndarray, points: ndarray
+    ) -> ndarray:
+        positions, charges = _as_arrays(positions, charges)
+        points = asarray(points, dtype=float).reshape(-1, 2)
+        backend = self.select("electric_field", len(charges), len(points))
+        return backend.electric_field(positions, charges, points)
+
+    def electric_forces(self, positions: ndarray, charges: ndarray) -> ndarray:
+        positions, charges = _as_arrays(positions, charges)
+        backend = self.select("electric_forces", len(charges), len(charges))
+        return backend.electric_forces(positions, charges)
+
+    def electric_potential(
+        self, positions: ndarray, charges: ndarray, points: ndarray
+    ) -> ndarray:
+        positions, charges = _as_arrays(positions, charges)
+        points = asarray(points, dtype=float).reshape(-1, 2)
+        backend = self.select("electric_potential", len(charges), len(points))
+        return backend.electric_potential(positions, charges, points)
+
+
+def available_backends() -> list[str]:
+    """Returns the names of the backends that can run on this machine."""
+    return [name for name, backend in BACKENDS.items() if backend.is_available()]
+
+
+def get_backend(name: str = "auto", **kwargs):
+    """
+    Returns a new instance of the backend registered as name, or an
+    AutoBackend if name is "auto". kwargs are passed to the constructor.
+    """
+    if name == "auto":
+        return AutoBackend(**kwargs)
+    if name not in BACKENDS:
+        raise ValueError(
+            f"unknown backend '{name}', available backends: "
+            f"auto, {', '.join(BACKENDS)}"
+        )
+    return BACKENDS[name](**kwargs)
+
+
+def calibrate(
+    backends: dict,
+    kernel: str,
+    charges_count: int,
+    points_count: int,
+    repeat: int = AutoBackend.CALIBRATION_REPEAT,
+) -> dict[str, float]:
+    """
+    Times kernel on each of backends (a dict of name: backend) and returns
+    the best time of each one in seconds.
+
+    Problems with more than CALIBRATION_PAIRS pairs of charge and point are
+    scaled down to that size, keeping the ratio of charges to points, and
+    backends whose MAX_PAIRS is smaller than the real problem are skipped.
+    """
+    pairs = max(charges_count * points_count, 1)
+    scale = min(1.0, (AutoBackend.CALIBRATION_PAIRS / pairs) ** 0.5)
+    charges_sample = max(1, round(charges_count * scale))
+    points_sample = max(1, round(points_count * scale))
+
+    rng = random.default_rng(0)
+    positions = rng.uniform(0, 1000, (charges_sample, 2))
+    charges = rng.choice([-1, 1], charges_sample) * constants.ELEMENTARY_CHARGE
+    points = rng.uniform(0, 1000, (points_sample, 2))
+    arguments = (positions, charges)
+    if kernel != "electric_forces":
+        arguments += (points,)
+
+    timings = {}
+    for name, backend in backends.items():
+        if backend.MAX_PAIRS is not None and pairs > backend.MAX_PAIRS:
+            continue
+        function = getattr(backend, kernel)
+        function(*arguments)
+        best = float("inf")
+        for _ in range(repeat):
+            start = perf_counter()
+            function(*arguments)
+            best = min(best, perf_counter() - start)
+        timings[name] = best
+    return timings
+
+
+def _as_arrays(positions: ndarray, charges: ndarray) -> tuple[ndarray, ndarray]:
+    positions = asarray(positions, dtype=float).reshape(-1, 2)
+    charges = asarray(charges, dtype=float).reshape(-1)
+    return positions, charges
+
+
+def _point_charges(positions: ndarray, charges: ndarray) -> list[PointCharge]:
+    positions, charges = _as_arrays(positions, charges)
+    return [
+        PointCharge(charge, position)
+        for charge, position in zip(charges.tolist(), positions)
+    ]
@@ -0,0 +1,285 @@
+from numpy import (
+    ndarray,
+    asarray,
+    arange,
+    argsort,
+    bincount,
+    zeros,
+    array,
+    einsum,
+    newaxis,
+    sqrt,
+    percentile,
+)
+from time import perf_counter
+from electripy.physics import constants, kernels
+
+
+class QuadTree:
+    DEFAULT_LEAF_SIZE = 16
+    MAX_DEPTH = 48
+
+    def __init__(
+        self, positions: ndarray, charges: ndarray, leaf_size: int = DEFAULT_LEAF_SIZE
+    ) -> None:
+        """
+        A QuadTree instance splits the plane in squares (nodes) until each
+        square holds at most leaf_size charges.
+
+        Every node stores the aggregate of its charges as two pseudo
+        charges: the sum of its positive charges placed at their
+        charge-weighted center, and the same for its negative charges.
+        Keeping both signs apart keeps the approximation meaningful for
+        neutral groups (a dipole has zero net charge, but not zero field).
+
+        Nodes are stored in flat arrays. The charges of a node are the
+        contiguous range [start, end) of the order array, and the four
+        children of a node (if any) are stored one after the other starting
+        at first_child.
+        """
+        self.positions = asarray(positions, dtype=float).reshape(-1, 2)
+        self.charges = asarray(charges, dtype=float).reshape(-1)
+        self.leaf_size = leaf_size
+        self.order = arange(len(self.charges))
+
+        self._centers = []
+        self._half_sizes = []
+        self._ranges = []
+        self._first_child = []
+        self._build()
+
+        self.centers = array(self._centers).reshape(-1, 2)
+        self.half_sizes = array(self._half_sizes)
+        self.ranges = array(self._ranges).reshape(-1, 2)
+        self.first_child = array(self._first_child)
+        self._compute_moments()
+
+    def _add_node(self, center: tuple, half_size: float, start: int, end: int) -> int:
+        self._centers.append(center)
+        self._half_sizes.append(half_size)
+        self._ranges.append((start, end))
+        self._first_child.append(-1)
+        return len(self._first_child) - 1
+
+    def _build(self) -> None:
+        if not len(self.charges):
+            self._add_node((0.0, 0.0), 0.0, 0, 0)
+            return
+
+        low = self.positions.min(axis=0)
+        high = self.positions.max(axis=0)
+        half_size = max((high - low).max() / 2, 0.5) * 1.0001
+        root = self._add_node(tuple((low + high) / 2), half_size, 0, len(self.charges))
+
+        stack = [(root, 0)]
+        while stack:
+            node, depth = stack.pop()
+            start, end = self._ranges[node]
+            if end - start <= self.leaf_size or depth >= QuadTree.MAX_DEPTH:
+                continue
+
+            cx, cy = self._centers[node]
+            indices = self.order[start:end]
+            node_positions = self.positions[indices]
+            if (node_positions == node_positions[0]).all():
+                continue
+            quadrants = (node_positions[:, 0] >= cx) + 2 * (node_positions[:, 1] >= cy)
+            self.order[start:end] = indices[argsort(quadrants, kind="stable")]
+            counts = bincount(quadrants, minlength=4)
+
+            half = self._half_sizes[node] / 2
+            self._first_child[node] = len(self._first_child)
+            child_start = start
+            for quadrant in range(4):
+                child_center = (
+                    cx + (half if quadrant & 1 else -half),
+                    cy + (half if quadrant & 2 else -half),
+                )
+                child_end = child_start + counts[quadrant]
+                child = self._add_node(child_center, half, child_start, child_end)
+                stack.append((child, depth + 1))
+                child_start = child_end
+
+    def _compute_moments(self) -> None:
+        """
+        Computes the positive and negative pseudo charges of every node.
+        """
+        size = len(self.first_child)
+        self.positive_charges = zeros(size)
+        self.negative_charges = zeros(size)
+        self.positive_centers = self.centers.copy()
+        self.negative_centers = self.centers.copy()
+
+        ordered_charges = self.charges[self.order]
+        ordered_positions = self.positions[self.order]
+        for node, (start, end) in enumerate(self.ranges):
+            node_charges = ordered_charges[start:end]
+            node_positions = ordered_positions[start:end]
+            positive = node_charges > 0
+            for is_positive, totals, centers in (
+                (positive, self.positive_charges, self.positive_centers),
+                (~positive, self.negative_charges, self.negative_centers),
+            ):
+                weights = node_charges[is_positive]
+                total = weights.sum()
+                if total == 0:
+                    continue
+                totals[node] = total
+                centers[node] = weights @ node_positions[is_positive] / total
+
+    def __len__(self) -> int:
+        return len(self.first_child)
+
+    def electric_field(self, points: ndarray, theta: float) -> ndarray:
+        """
+        Returns an (M, 2) array with the approximated electric field at
+        each point.
+
+        All points walk the tree together. A node is accepted as a whole
+        for the points where node_width / distance < theta, the distance
+        being measured to the node center. The remaining points go down to
+        its children, or are summed charge by charge when the node is a
+        leaf. theta = 0 is the exact direct sum.
+        """
+        points = asarray(points, dtype=float).reshape(-1, 2)
+        field = zeros(points.shape)
+        if not len(self.charges):
+            return field
+
+        stack = [(0, arange(len(points)))]
+        while stack:
+            node, targets = stack.pop()
+            start, end = self.ranges[node]
+            if start == end:
+                continue
+
+            target_points = points[targets]
+            offsets = target_points - self.centers[node]
+            distances = sqrt(einsum("ij,ij->i", offsets, offsets))
+            far = 2 * self.half_sizes[node] < theta * distances
+            if far.any():
+                field[targets[far]] += self._pseudo_charges_field(
+                    node, target_points[far]
+                )
+                targets = targets[~far]
+                if not len(targets):
+                    continue
+
+            first_child = self.first_child[node]
+            if first_child == -1:
+                indices = self.order[start:end]
+                field[targets] += kernels.electric_field(
+                    self.positions[indices], self.charges[indices], points[targets]
+                )
+            else:
+                for child in range(first_child, first_child + 4):
+                    stack.append((child, targets))
+        return field
+
+    def _pseudo_charges_field(self, node: int, points: ndarray) -> ndarray:
+        """
+        Returns the field made at points by the two pseudo charges of node.
+        """
+        field = zeros(points.shape)
+        for charge, center in (
+            (self.positive_charges[node], self.positive_centers[node]),
+            (self.negative_charges[node], self.negative_centers[node]),
+        ):
+            if charge == 0:
+                continue
+            r_vectors = points - center
+            r_squared = einsum("ij,ij->i", r_vectors, r_vectors)
+            field += r_vectors * (charge / (r_squared * sqrt(r_squared)))[:, newaxis]
+        return constants.COULOMB_CONST * field
+
+
+class BarnesHutSolver:
+    DEFAULT_THETA = 0.5
+
+    def __init__(
+        self, theta: float = DEFAULT_THETA, leaf_size: int = QuadTree.DEFAULT_LEAF_SIZE
+    ) -> None:
+        """
+        Approximates fields and forces with a Barnes-Hut quadtree in
+        O((N + M) log N) instead of O(N * M). theta is the opening angle:
+        the lower it is, the more accurate and the slower the solver is.
+        Use accuracy_report to pick a theta for a given error budget.
+        """
+        self.theta = theta
+        self.leaf_size = leaf_size
+
+    def electric_field(
+        self, positions: ndarray, charges: ndarray, points: ndarray
+    ) -> ndarray:
+        tree = QuadTree(positions, charges, self.leaf_size)
+        return tree.electric_field(points, self.theta)
+
+    def electric_forces(self, positions: ndarray, charges: ndarray) -> ndarray:
+        tree = QuadTree(positions, charges, self.leaf_size)
+        fields = tree.electric_field(tree.positions, self.theta)
+        return fields * tree.charges[:, newaxis]
+
+
+def accuracy_report(
+    positions: ndarray,
+    charges: ndarray,
+    thetas: tuple = (0.2, 0.35, 0.5, 0.7, 1.0),
+    points: ndarray = None,
+    leaf_size: int = QuadTree.DEFAULT_LEAF_SIZE,
+) -> list[dict]:
+    """
+    Compares the Barnes-Hut solver against the direct sum for every theta.
+
+    If points is None the forces on the charges are compared, otherwise the
+    field at points. The relative error of a vector is
+    norm(approximated - exact) / norm(exact). Every row of the report has
+    the theta, the max, 99th percentile and mean relative errors, and the
+    time taken by both methods.
+    """
+    start = perf_counter()
+    if points is None:
+        exact = kernels.electric_forces(positions, charges)
+    else:
+        exact = kernels.electric_field(positions, charges, points)
+    direct_time = perf_counter() - start
+    exact_norms = sqrt(einsum("ij,ij->i", exact, exact))
+    valid = exact_norms > 0
+
+    report = []
+    for theta in thetas:
+        solver = BarnesHutSolver(theta, leaf_size)
+        start = perf_counter()
+        if points is None:
+            approximated = solver.electric_forces(positions, charges)
+        else:
+            approximated = solver.electric_field(positions, charges, points)
+        elapsed = perf_counter() - start
+
+        errors = approximated - exact
+        relative_errors = sqrt(einsum("ij,ij->i", errors, errors))[valid] / (
+            exact_norms[valid]
+        )
+        if not len(relative_errors):
+            relative_errors = zeros(1)
+        report.append(
+            {
+                "theta": theta,
+                "max_relative_error": float(relative_errors.max()),
+                "p99_relative_error": float(percentile(relative_errors, 99)),
+                "mean_relative_error": float(relative_errors.mean()),
+                "time": elapsed,
+                "direct_time": direct_time,
+            }
+        )
+    return report
+
+
+def max_theta_for_error(
+    report: list[dict], max_error: float, metric: str = "p99_relative_error"
+) -> float:
+    """
+    Returns the greatest theta of an accuracy_report whose metric does not
+    exceed max_error, or 0 (exact direct sum) if none of them does.
+    """
+    thetas = [row["theta"] for row in report if row[metric] <= max_error]
+    return max(thetas, default=0.0)
@@ -1,84 +1,211 @@
-from numpy import ndarray, array
-from electripy.physics.charges import PointCharge
+from numpy import (
+    ndarray,
+    asarray,
+    empty,
+    zeros,
+    arange,
+    broadcast_to,
+    int8,
+    int64,
+    newaxis,
+)
+from electripy.physics.charges import PointCharge, Proton, Electron
+from electripy.physics.solvers import DirectSolver
+from electripy.physics.backends import get_backend
+from typing import Union
 
 
-class _ChargesSet:
-    """
-    A _ChargesSet instance is a group of charges. The electric
-    field at a given point can be calculated as the sum of each
-    electric field at that point for every charge in the charge
-    set.
-    """
-
-    def __init__(self, charges: list[PointCharge]) -> None:
-        self.charges = charges
+class ChargeDistribution:
+    INITIAL_CAPACITY = 16
+    CHARGE_TYPES = {Proton.KIND: Proton, Electron.KIND: Electron}
 
-    def electric_field(self, point: ndarray) -> ndarray:
+    def __init__(self, solver=None, backend="auto"):
         """
-        Returns the electric field at the specified point.
+        Charges are stored in contiguous arrays (positions, charges and
+        kinds), one row per charge. Every charge receives a handle when it
+        is added. Handles never change, while the row (slot) of a charge
+        may change when another charge is removed: removing swaps the last
+        row into the freed one, so adding and removing are O(1).
+
+        PointCharge objects are kept next to the arrays so that the charges
+        given to add_charge are the ones returned by __getitem__. Charges
+        added through add_charges have no object until they are requested.
+        The slot of each handle is kept in an array indexed by handle (-1
+        once the charge is removed), so adding many charges at once does
+        not go through a Python dict.
+
+        solver computes the fields and forces of the distribution (see
+        electripy.physics.solvers). Defaults to an exact DirectSolver
+        running on backend, a backend name or instance (see
+        electripy.physics.backends) that also computes the potential.
         """
-        ef = array([0.0, 0.0])
-        for charge in self.charges:
-            ef += charge.electric_field(point)
-        return ef
+        self.backend = get_backend(backend) if isinstance(backend, str) else backend
+        self.solver = solver if solver is not None else DirectSolver(self.backend)
+        self._size = 0
+        self._positions = empty((ChargeDistribution.INITIAL_CAPACITY, 2))
+        self._charges = empty(ChargeDistribution.INITIAL_CAPACITY)
+        self._kinds = empty(ChargeDistribution.INITIAL_CAPACITY, dtype=int8)
+        self._handles = empty(ChargeDistribution.INITIAL_CAPACITY, dtype=int64)
+        self._objects: list[Union[PointCharge, None]] = []
+        self._slot_by_handle = empty(ChargeDistribution.INITIAL_CAPACITY, dtype=int64)
+        self._handle_by_charge: dict[PointCharge, int] = {}
+        self._next_handle = 0
+        self._version = 0
 
-    def electric_force(self, charge: PointCharge) -> ndarray:
+    @property
+    def version(self) -> int:
         """
-        Returns the force of the electric field exerted
-        on the charge.
+        Number of changes made to the distribution. It grows every time
+        charges are added or removed, so a result computed from the charges
+        can be tagged with it to tell when it is out of date.
         """
-        ef = self.electric_field(charge.position)
-        return ef * charge.charge
+        return self._version
 
-    def __getitem__(self, index):
-        return self.charges[index]
+    @property
+    def positions(self) -> ndarray:
+        """(N, 2) view of the charges positions."""
+        return self._positions[: self._size]
 
+    @property
+    def charges(self) -> ndarray:
+        """(N,) view of the charges values in coulomb."""
+        return self._charges[: self._size]
 
-class ChargeDistribution:
-    def __init__(self):
+    @property
+    def kinds(self) -> ndarray:
+        """(N,) view of the charges kinds (see PointCharge.KIND)."""
+        return self._kinds[: self._size]
+
+    @property
+    def handles(self) -> ndarray:
+        """(N,) view of the charges handles."""
+        return self._handles[: self._size]
+
+    def _reserve(self, size: int) -> None:
         """
-        There is one group for each charge in charges.
-        Each group is a two dimensional vector. The first element is
-        a charge, and the second element is the ChargeSet instance
-        containing all charges in charges except the charge itself.
+        Makes sure the arrays can hold size charges, doubling their
+        capacity when they are full.
         """
-        self.groups = []
-        self.charges_set = _ChargesSet([])
+        capacity = len(self._charges)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        for name in ("_positions", "_charges", "_kinds", "_handles"):
+            old = getattr(self, name)
+            new = empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[: self._size] = old[: self._size]
+            setattr(self, name, new)
 
-    def add_charge(self, charge: PointCharge) -> None:
+    def _reserve_handles(self, count: int) -> None:
+        """Makes sure count more handles fit in the slot by handle array."""
+        size = self._next_handle + count
+        capacity = len(self._slot_by_handle)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        slots = empty(capacity, dtype=int64)
+        slots[: self._next_handle] = self._slot_by_handle[: self._next_handle]
+        self._slot_by_handle = slots
+
+    def add_charge(self, charge: PointCharge) -> int:
         """
-        Adds the charge to charges_set and updates the groups.
+        Adds the charge to the distribution and returns its handle.
         """
-        self.charges_set.charges.append(charge)
-        self._update_groups(self.charges_set.charges)
+        if charge in self._handle_by_charge:
+            raise ValueError("charge is already in the charge distribution")
+        self._reserve(self._size + 1)
+        self._reserve_handles(1)
+        slot = self._size
+        handle = self._next_handle
+        self._positions[slot] = charge.position
+        self._charges[slot] = charge.charge
+        self._kinds[slot] = charge.KIND
+        self._handles[slot] = handle
+        self._objects.append(charge)
+        self._slot_by_handle[handle] = slot
+        self._handle_by_charge[charge] = handle
+        self._next_handle += 1
+        self._size += 1
+        self._version += 1
+        return handle
 
-    def remove_charge(self, charge: PointCharge) -> None:
+    def add_charges(
+        self, positions: ndarray, charges: ndarray, kinds: ndarray = None
+    ) -> ndarray:
         """
-        Removes the charge to charges_set and updates the groups.
+        Adds several charges at once and returns their handles.
+
+        positions: (K, 2) array in meters
+        charges: (K,) array in coulomb
+        kinds: (K,) array of PointCharge.KIND values. Defaults to
+        PointCharge.KIND for every charge. The charges of the Proton and
+        Electron kinds must be the charge of a proton or an electron.
         """
-        self.charges_set.charges.remove(charge)
-        self._update_groups(self.charges_set.charges)
+        positions = asarray(positions, dtype=float).reshape(-1, 2)
+        charges = asarray(charges, dtype=float).reshape(-1)
+        if len(positions) != len(charges):
+            raise ValueError("positions and charges must have the same length")
+        if kinds is not None:
+            kinds = broadcast_to(asarray(kinds, dtype=int8), charges.shape)
+            for kind, charge_type in ChargeDistribution.CHARGE_TYPES.items():
+                expected = charge_type(zeros(2)).charge
+                if (charges[kinds == kind] != expected).any():
+                    raise ValueError(
+                        f"charges of kind {kind} must be {charge_type.__name__} "
+                        f"charges ({expected} C)"
+                    )
+        count = len(charges)
+        start, end = self._size, self._size + count
+        handles = arange(self._next_handle, self._next_handle + count, dtype=int64)
+
+        self._reserve(end)
+        self._reserve_handles(count)
+        self._positions[start:end] = positions
+        self._charges[start:end] = charges
+        self._kinds[start:end] = PointCharge.KIND if kinds is None else kinds
+        self._handles[start:end] = handles
+        self._objects.extend([None] * count)
+        first = self._next_handle
+        self._slot_by_handle[first : first + count] = arange(start, end)
+        self._next_handle += count
+        self._size = end
+        self._version += 1
+        return handles
 
-    def _update_groups(self, charges: list[PointCharge]) -> None:
+    def remove_charge(self, charge: PointCharge) -> None:
+        """
+        Removes the charge from the distribution.
         """
-        Let X be a charge from the charge distribution. Computing X electric
-        force involves computing the electric force exerted on X by all
-        the other charges on the charge distribution.
+        if charge not in self._handle_by_charge:
+            raise ValueError("charge is not in the charge distribution")
+        self.remove(self._handle_by_charge[charge])
 
-        This means that, in order to compute the electric force of X,
-        we need a two dimensional vector where the first component is
-        the charge X itself and the second component is a ChargeSet
-        instance cointaning all charges on the charge distribution except
-        X. This vector is called 'group'.
+    def remove(self, handle: int) -> None:
+        """
+        Removes the charge with the given handle by moving the last charge
+        into its slot.
         """
-        self.groups = []
-        for charge in charges:
-            self.groups.append(
-                [
-                    charge,
-                    _ChargesSet([c for c in charges if c is not charge]),
-                ]
-            )
+        if not 0 <= handle < self._next_handle or self._slot_by_handle[handle] < 0:
+            raise KeyError(handle)
+        slot = int(self._slot_by_handle[handle])
+        self._slot_by_handle[handle] = -1
+        charge = self._objects[slot]
+        if charge is not None:
+            del self._handle_by_charge[charge]
+
+        last = self._size - 1
+        if slot != last:
+            self._positions[slot] = self._positions[last]
+            self._charges[slot] = self._charges[last]
+            self._kinds[slot] = self._kinds[last]
+            self._handles[slot] = self._handles[last]
+            self._objects[slot] = self._objects[last]
+            self._slot_by_handle[self._handles[slot]] = slot
+        self._objects.pop()
+        self._size = last
+        self._version += 1
 
     def get_electric_forces(self) -> list[tuple[PointCharge, ndarray]]:
         """
@@ -87,19 +214,59 @@ class ChargeDistribution:
         vector. The first element is the charge and the second element is
         the electric force the other charges make on it.
         """
-        electric_forces = []
-        for group in self.groups:
-            electric_forces.append((group[0], group[1].electric_force(group[0])))
-        return electric_forces
+        forces = self.get_electric_forces_array()
+        return [(self[slot], forces[slot]) for slot in range(self._size)]
+
+    def get_electric_forces_array(self) -> ndarray:
+        """
+        Returns an (N, 2) array where row i is the electric force the other
+        charges make on the charge stored in slot i.
+        """
+        return self.solver.electric_forces(self.positions, self.charges)
 
     def get_electric_field(self, position: ndarray) -> ndarray:
         """
         Returns the electric force array at the given point.
         """
-        return self.charges_set.electric_field(position)
+        return self.get_electric_field_batch(asarray(position)[newaxis])[0]
+
+    def get_electric_field_batch(self, points: ndarray) -> ndarray:
+        """
+        Returns an (M, 2) array with the electric field at each point of
+        the (M, 2) points array. All charges are evaluated at once with
+        numpy broadcasting instead of one PointCharge at a time.
+        """
+        return self.solver.electric_field(self.positions, self.charges, points)
+
+    def get_electric_potential_batch(self, points: ndarray) -> ndarray:
+        """
+        Returns an (M,) array with the electric potential at each point of
+        the (M, 2) points array.
+        """
+        return self.backend.electric_potential(self.positions, self.charges, points)
 
     def __len__(self):
-        return len(self.charges_set.charges)
+        return self._size
 
-    def __getitem__(self, index):
-        return self.charges_set[index]
+    def __getitem__(self, index: int) -> PointCharge:
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("charge distribution index out of range")
+        charge = self._objects[index]
+        if charge is None:
+            charge = self._build_charge(index)
+            self._objects[index] = charge
+            self._handle_by_charge[charge] = int(self._handles[index])
+        return charge
+
+    def _build_charge(self, slot: int) -> PointCharge:
+        """
+        Creates the PointCharge object of a charge added through
+        add_charges.
+        """
+        position = self._positions[slot].copy()
+        charge_type = ChargeDistribution.CHARGE_TYPES.get(int(self._kinds[slot]))
+        if charge_type is None:
+            return PointCharge(float(self._charges[slot]), position)
+        return charge_type(position)
@@ -5,6 +5,8 @@ from typing import Union
 
 
 class PointCharge:
+    KIND = 0
+
     def __init__(
         self,
         charge: Union[float, int],
@@ -27,6 +29,13 @@ class PointCharge:
             constants.COULOMB_CONST * array(r_vector * (self.charge / r_norm ** 3)) * -1
         )
 
+    def electric_potential(self, point: ndarray) -> float:
+        """
+        Returns the electric potential at the specified point.
+        """
+        r_norm = norm(array(self.position - point))
+        return constants.COULOMB_CONST * self.charge / r_norm
+
 
 class Electron(PointCharge):
     """
@@ -34,6 +43,8 @@ class Electron(PointCharge):
     is -e, where e is the elementary charge (1.60218e-19).
     """
 
+    KIND = -1
+
     def __init__(self, position: ndarray) -> None:
         self.charge = constants.ELEMENTARY_CHARGE * -1
         self.position = array(position)
@@ -45,6 +56,8 @@ class Proton(PointCharge):
     is e, where e is the elementary charge (1.60218e-19).
     """
 
+    KIND = 1
+
     def __init__(self, position: ndarray) -> None:
         self.charge = constants.ELEMENTARY_CHARGE
         self.position = array(position)
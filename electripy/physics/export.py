@@ -0,0 +1,157 @@
+from numpy import arange, meshgrid, column_stack, dtype as data_type
+from numpy.lib.format import open_memmap
+from electripy.physics.charge_distribution import ChargeDistribution
+from math import ceil
+from hashlib import sha1
+from typing import Callable
+import json
+import os
+
+
+class GridExport:
+    QUANTITIES = ("field", "potential")
+    TILE_SIZE = 512
+    PROGRESS_SUFFIX = ".progress"
+
+    def __init__(
+        self,
+        charge_distribution: ChargeDistribution,
+        path: str,
+        width: int,
+        height: int,
+        quantity: str = "field",
+        spacing: float = 1.0,
+        origin: tuple = (0.0, 0.0),
+        tile_size: int = TILE_SIZE,
+        dtype="float64",
+    ) -> None:
+        """
+        A GridExport instance computes the field (or the potential) of
+        charge_distribution on a grid of height rows and width columns and
+        writes it to the .npy file path, without keeping the grid in memory.
+
+        Row i and column j of the grid is the point origin + (j, i) *
+        spacing, in the units of the positions of the charges. The file
+        holds a (height, width, 2) array for the field and a (height, width)
+        one for the potential, of the given dtype. Both are computed with
+        the batched methods of charge_distribution.
+
+        The grid is computed in tiles of tile_size x tile_size points, row
+        of tiles after row of tiles, and each tile is written through a
+        memory map that is flushed and closed right away, so memory use is
+        bounded by the size of a tile whatever the size of the grid. After
+        each tile the number of tiles done is stored next to the output, in
+        path + PROGRESS_SUFFIX, so an interrupted export started again with
+        the same charges and grid carries on from the last tile written.
+        The progress file is removed when the export is finished.
+        """
+        if quantity not in GridExport.QUANTITIES:
+            raise ValueError(
+                f"unknown quantity '{quantity}', available quantities: "
+                f"{', '.join(GridExport.QUANTITIES)}"
+            )
+        if width <= 0 or height <= 0 or tile_size <= 0:
+            raise ValueError("width, height and tile_size must be positive")
+        self.charge_distribution = charge_distribution
+        self.path = path
+        self.width = width
+        self.height = height
+        self.quantity = quantity
+        self.spacing = spacing
+        self.origin = tuple(origin)
+        self.tile_size = tile_size
+        self.dtype = data_type(dtype)
+
+    @property
+    def shape(self) -> tuple:
+        """Shape of the array written to path."""
+        if self.quantity == "field":
+            return (self.height, self.width, 2)
+        return (self.height, self.width)
+
+    @property
+    def tiles(self) -> int:
+        """Number of tiles of the grid."""
+        return self._get_tile_columns() * ceil(self.height / self.tile_size)
+
+    def run(self, callback: Callable = None) -> None:
+        """
+        Computes the tiles not written yet. callback, if given, is called
+        with the number of tiles done and the number of tiles after each
+        tile.
+        """
+        key = self._get_key()
+        done = self._get_progress(key)
+        if done == 0:
+            # Writes the header of the file, which is sparse until the
+            # tiles are written.
+            open_memmap(self.path, "w+", self.dtype, self.shape).flush()
+            self._set_progress(key, 0)
+        for tile in range(done, self.tiles):
+            self._write_tile(tile)
+            self._set_progress(key, tile + 1)
+            if callback is not None:
+                callback(tile + 1, self.tiles)
+        os.remove(self.path + GridExport.PROGRESS_SUFFIX)
+
+    def _get_tile_columns(self) -> int:
+        return ceil(self.width / self.tile_size)
+
+    def _write_tile(self, tile: int) -> None:
+        row, column = divmod(tile, self._get_tile_columns())
+        top, left = row * self.tile_size, column * self.tile_size
+        bottom = min(top + self.tile_size, self.height)
+        right = min(left + self.tile_size, self.width)
+        ys, xs = meshgrid(arange(top, bottom), arange(left, right), indexing="ij")
+        points = column_stack((xs.ravel(), ys.ravel())) * float(self.spacing)
+        points += self.origin
+
+        if self.quantity == "field":
+            values = self.charge_distribution.get_electric_field_batch(points)
+        else:
+            values = self.charge_distribution.get_electric_potential_batch(points)
+        array = open_memmap(self.path, "r+")
+        array[top:bottom, left:right] = values.reshape(
+            (bottom - top, right - left) + self.shape[2:]
+        )
+        array.flush()
+        del array
+
+    def _get_key(self) -> dict:
+        """
+        Returns what an export must share with an interrupted one to resume
+        it: the charges, the grid and the output format.
+        """
+        digest = sha1(self.charge_distribution.positions.tobytes())
+        digest.update(self.charge_distribution.charges.tobytes())
+        return {
+            "charges": digest.hexdigest(),
+            "shape": list(self.shape),
+            "spacing": self.spacing,
+            "origin": list(self.origin),
+            "tile_size": self.tile_size,
+            "dtype": self.dtype.str,
+        }
+
+    def _get_progress(self, key: dict) -> int:
+        """
+        Returns the number of tiles an interrupted export of the same grid
+        already wrote to path, or 0 if there is none.
+        """
+        if not os.path.exists(self.path):
+            return 0
+        try:
+            with open(self.path + GridExport.PROGRESS_SUFFIX) as file:
+                progress = json.load(file)
+        except (OSError, ValueError):
+            return 0
+        if not isinstance(progress, dict) or progress.get("key") != key:
+            return 0
+        return progress.get("done", 0)
+
+    def _set_progress(self, key: dict, done: int) -> None:
+        """Stores the number of tiles written, replacing the file at once."""
+        path = self.path + GridExport.PROGRESS_SUFFIX
+        with open(path + ".tmp", "w") as file:
+            json.dump({"key": key, "done": done}, file)
+        os.replace(path + ".tmp", path)
@@ -0,0 +1,329 @@
+from numpy import (
+    ndarray,
+    asarray,
+    zeros,
+    ones,
+    empty,
+    arange,
+    bincount,
+    argsort,
+    searchsorted,
+    concatenate,
+    clip,
+    floor,
+    ceil,
+    log,
+    abs as absolute,
+    conj,
+    einsum,
+    newaxis,
+    pad,
+    complex128,
+)
+from math import comb
+from electripy.physics import constants, kernels
+
+
+class FMMSolver:
+    DEFAULT_ORDER = 12
+    DEFAULT_LEAF_SIZE = 32
+    MIN_LEVEL = 2
+    MAX_LEVEL = 7
+
+    def __init__(
+        self, order: int = DEFAULT_ORDER, leaf_size: int = DEFAULT_LEAF_SIZE
+    ) -> None:
+        """
+        Fast multipole method solver. Fields and forces are computed in
+        O(N + M) instead of O(N * M).
+
+        Points are written as complex numbers z = x + iy. Since
+        1 / |z - z0| = (z - z0) ** -1/2 * conj(z - z0) ** -1/2, the Coulomb
+        potential of a group of charges around a center c is expanded as a
+        double power series in w = z - c and conj(w):
+
+            potential(w) = 1/|w| sum a_n a_m moments[n, m] w**-n conj(w)**-m
+
+        where moments[n, m] = sum q (z0 - c)**n conj(z0 - c)**m and a_n are
+        the coefficients of (1 - x) ** -1/2. Multipole expansions are
+        translated (M2M), turned into local expansions (M2L) and shifted
+        down the tree (L2L) with small matrix products, so every operator is
+        O(order ** 3).
+
+        order is the highest power kept in each expansion: the error
+        decreases geometrically with it. leaf_size is the average number of
+        charges and points wanted per leaf of the (uniform) quadtree.
+        """
+        self.order = order
+        self.leaf_size = leaf_size
+        self._build_coefficients()
+
+    def _build_coefficients(self) -> None:
+        p = self.order + 1
+        self._a = ones(p)
+        for n in range(1, p):
+            self._a[n] = self._a[n - 1] * (2 * n - 1) / (2 * n)
+
+        # _shifted_binomials[n, k] = binom(-n - 1/2, k)
+        self._shifted_binomials = ones((p, p))
+        for n in range(p):
+            for k in range(1, p):
+                self._shifted_binomials[n, k] = (
+                    self._shifted_binomials[n, k - 1] * (-n - 0.5 - (k - 1)) / k
+                )
+        self._binomials = zeros((p, p))
+        for n in range(p):
+            for k in range(n + 1):
+                self._binomials[n, k] = comb(n, k)
+
+    def electric_field(
+        self, positions: ndarray, charges: ndarray, points: ndarray
+    ) -> ndarray:
+        return self._evaluate(positions, charges, points)
+
+    def electric_forces(self, positions: ndarray, charges: ndarray) -> ndarray:
+        charges = asarray(charges, dtype=float).reshape(-1)
+        return self._evaluate(positions, charges, positions) * charges[:, newaxis]
+
+    def _evaluate(
+        self, positions: ndarray, charges: ndarray, points: ndarray
+    ) -> ndarray:
+        positions = asarray(positions, dtype=float).reshape(-1, 2)
+        charges = asarray(charges, dtype=float).reshape(-1)
+        points = asarray(points, dtype=float).reshape(-1, 2)
+        if not len(charges) or not len(points):
+            return zeros(points.shape)
+
+        # Everything is computed in a unit square to keep the powers of the
+        # expansions well scaled.
+        everything = concatenate((positions, points))
+        origin = everything.min(axis=0)
+        size = max((everything.max(axis=0) - origin).max(), 1.0) * 1.0001
+        sources = _to_complex((positions - origin) / size)
+        targets = _to_complex((points - origin) / size)
+
+        count = len(charges) + len(points)
+        level = int(ceil(log(max(count / (2 * self.leaf_size), 1)) / log(4)))
+        level = min(max(level, FMMSolver.MIN_LEVEL), FMMSolver.MAX_LEVEL)
+        side = 2**level
+
+        source_boxes = _get_boxes(sources, side)
+        target_boxes = _get_boxes(targets, side)
+        moments = self._particles_to_multipoles(sources, charges, source_boxes, level)
+        locals_ = self._multipoles_to_locals(moments, level)
+        field = self._locals_to_points(locals_, targets, target_boxes, side)
+        field = (constants.COULOMB_CONST / size**2) * field
+        return field + _near_field(
+            positions, charges, points, source_boxes, target_boxes, side
+        )
+
+    def _particles_to_multipoles(
+        self, sources: ndarray, charges: ndarray, boxes: ndarray, level: int
+    ) -> ndarray:
+        """
+        Returns the moments of every leaf as a (side, side, p, p) array.
+        """
+        side = 2**level
+        p = self.order + 1
+        offsets = sources - _box_centers(boxes, side)
+        powers = _powers(offsets, p)
+        flat_boxes = boxes[:, 0] * side + boxes[:, 1]
+
+        moments = zeros((side * side, p, p), dtype=complex128)
+        for n in range(p):
+            weights = (charges * powers[:, n])[:, newaxis] * conj(powers)
+            for m in range(p):
+                moments[:, n, m] = bincount(
+                    flat_boxes, weights=weights[:, m].real, minlength=side * side
+                ) + 1j * bincount(
+                    flat_boxes, weights=weights[:, m].imag, minlength=side * side
+                )
+        return moments.reshape(side, side, p, p)
+
+    def _multipoles_to_locals(self, leaf_moments: ndarray, level: int) -> ndarray:
+        """
+        Goes up the tree merging multipole expansions (M2M), converts them
+        into local expansions of the boxes in each interaction list (M2L)
+        and goes down the tree shifting local expansions (L2L). Returns the
+        local expansions of the leaves.
+        """
+        moments = {level: leaf_moments}
+        for lvl in range(level, FMMSolver.MIN_LEVEL, -1):
+            moments[lvl - 1] = self._merge_multipoles(moments[lvl], lvl)
+
+        locals_ = None
+        for lvl in range(FMMSolver.MIN_LEVEL, level + 1):
+            if locals_ is None:
+                locals_ = zeros(moments[lvl].shape, dtype=complex128)
+            else:
+                locals_ = self._split_locals(locals_, lvl)
+            self._add_interactions(locals_, moments[lvl], lvl)
+        return locals_
+
+    def _merge_multipoles(self, moments: ndarray, level: int) -> ndarray:
+        """
+        Returns the moments of the parents of the boxes at level (M2M).
+        """
+        side = 2**level
+        h = 1 / side
+        parents = zeros((side // 2, side // 2) + moments.shape[2:], dtype=moments.dtype)
+        for px in (0, 1):
+            for py in (0, 1):
+                shift = complex((px - 0.5) * h, (py - 0.5) * h)
+                matrix = self._binomials * _shift_powers(shift, self.order + 1)
+                parents += matrix @ moments[px::2, py::2] @ conj(matrix).T
+        return parents
+
+    def _split_locals(self, locals_: ndarray, level: int) -> ndarray:
+        """
+        Returns the parent local expansions shifted to the center of each
+        of their children at level (L2L).
+        """
+        side = 2**level
+        h = 1 / side
+        children = empty((side, side) + locals_.shape[2:], dtype=locals_.dtype)
+        for px in (0, 1):
+            for py in (0, 1):
+                shift = complex((px - 0.5) * h, (py - 0.5) * h)
+                matrix = (self._binomials * _shift_powers(shift, self.order + 1)).T
+                children[px::2, py::2] = matrix @ locals_ @ conj(matrix).T
+        return children
+
+    def _add_interactions(self, locals_: ndarray, moments: ndarray, level: int):
+        """
+        Adds to the local expansion of every box the multipole expansions
+        of its interaction list (M2L): the children of its parent's
+        neighbors which are not its own neighbors.
+        """
+        side = 2**level
+        h = 1 / side
+        half = side // 2
+        padded = pad(moments, ((3, 3), (3, 3), (0, 0), (0, 0)))
+        for px in (0, 1):
+            for py in (0, 1):
+                targets = locals_[px::2, py::2]
+                for dx in range(-2 - px, 4 - px):
+                    for dy in range(-2 - py, 4 - py):
+                        if abs(dx) <= 1 and abs(dy) <= 1:
+                            continue
+                        x = px + dx + 3
+                        y = py + dy + 3
+                        sources = padded[x : x + 2 * half : 2, y : y + 2 * half : 2]
+                        matrix = self._interaction_matrix(complex(-dx * h, -dy * h))
+                        targets += (
+                            matrix.T @ sources @ conj(matrix) / absolute(-dx - 1j * dy)
+                        ) * (1 / h)
+        return locals_
+
+    def _interaction_matrix(self, translation: complex) -> ndarray:
+        """
+        Returns G where G[n, k] = a_n binom(-n - 1/2, k) T**(-n - k).
+        """
+        p = self.order + 1
+        exponents = arange(p)[:, newaxis] + arange(p)[newaxis, :]
+        return (
+            self._a[:, newaxis] * self._shifted_binomials * translation ** (-exponents)
+        )
+
+    def _locals_to_points(
+        self, locals_: ndarray, targets: ndarray, boxes: ndarray, side: int
+    ) -> ndarray:
+        """
+        Evaluates the local expansions at the targets (L2P). The field is
+        Ex + iEy = -2 d(potential)/d(conj(z)).
+        """
+        p = self.order + 1
+        flat_locals = locals_.reshape(side * side, p, p)
+        derivative = flat_locals[:, :, 1:] * arange(1, p)
+        offsets = targets - _box_centers(boxes, side)
+        flat_boxes = boxes[:, 0] * side + boxes[:, 1]
+
+        field = empty((len(targets), 2))
+        chunk_size = kernels.DEFAULT_CHUNK_SIZE
+        for start in range(0, len(targets), chunk_size):
+            chunk = slice(start, start + chunk_size)
+            powers = _powers(offsets[chunk], p)
+            values = -2 * einsum(
+                "ik,ikl,il->i",
+                powers,
+                derivative[flat_boxes[chunk]],
+                conj(powers[:, :-1]),
+            )
+            field[chunk, 0] = values.real
+            field[chunk, 1] = values.imag
+        return field
+
+
+def _to_complex(points: ndarray) -> ndarray:
+    return points[:, 0] + 1j * points[:, 1]
+
+
+def _get_boxes(points: ndarray, side: int) -> ndarray:
+    """
+    Returns the (x, y) index of the leaf containing each point.
+    """
+    boxes = empty((len(points), 2), dtype=int)
+    boxes[:, 0] = clip(floor(points.real * side), 0, side - 1)
+    boxes[:, 1] = clip(floor(points.imag * side), 0, side - 1)
+    return boxes
+
+
+def _box_centers(boxes: ndarray, side: int) -> ndarray:
+    return ((boxes[:, 0] + 0.5) + 1j * (boxes[:, 1] + 0.5)) / side
+
+
+def _powers(values: ndarray, p: int) -> ndarray:
+    """
+    Returns an (M, p) array where column n is values ** n.
+    """
+    powers = ones((len(values), p), dtype=complex128)
+    for n in range(1, p):
+        powers[:, n] = powers[:, n - 1] * values
+    return powers
+
+
+def _shift_powers(shift: complex, p: int) -> ndarray:
+    """
+    Returns a (p, p) array where [n, k] = shift ** (n - k) for n >= k.
+    """
+    exponents = arange(p)[:, newaxis] - arange(p)[newaxis, :]
+    return (shift ** clip(exponents, 0, None)) * (exponents >= 0)
+
+
+def _near_field(
+    positions: ndarray,
+    charges: ndarray,
+    points: ndarray,
+    source_boxes: ndarray,
+    target_boxes: ndarray,
+    side: int,
+) -> ndarray:
+    """
+    Sums directly the field of the charges in the leaf of each point and in
+    its 8 neighbors (P2P).
+    """
+    source_flat = source_boxes[:, 0] * side + source_boxes[:, 1]
+    source_order = argsort(source_flat, kind="stable")
+    sorted_flat = source_flat[source_order]
+    box_starts = searchsorted(sorted_flat, arange(side * side + 1))
+
+    target_flat = target_boxes[:, 0] * side + target_boxes[:, 1]
+    target_order = argsort(target_flat, kind="stable")
+    target_starts = searchsorted(target_flat[target_order], arange(side * side + 1))
+
+    field = zeros(points.shape)
+    for box in bincount(target_flat, minlength=side * side).nonzero()[0]:
+        x, y = divmod(int(box), side)
+        neighbors = [
+            source_order[box_starts[nx * side + ny] : box_starts[nx * side + ny + 1]]
+            for nx in range(max(x - 1, 0), min(x + 2, side))
+            for ny in range(max(y - 1, 0), min(y + 2, side))
+        ]
+        indices = concatenate(neighbors)
+        if not len(indices):
+            continue
+        box_targets = target_order[target_starts[box] : target_starts[box + 1]]
+        field[box_targets] = kernels.electric_field(
+            positions[indices], charges[indices], points[box_targets]
+        )
+    return field
@@ -0,0 +1,173 @@
+from numpy import ndarray, asarray, empty, zeros, newaxis, einsum, arange
+from numpy import dtype as data_type, float64
+from electripy.physics import constants
+
+
+DEFAULT_CHUNK_SIZE = 4096
+DEFAULT_BLOCK_SIZE = 512
+MAX_CHUNK_ELEMENTS = 2**20
+PRECISIONS = ("float64", "float32")
+
+
+def electric_field(
+    positions: ndarray,
+    charges: ndarray,
+    points: ndarray,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    dtype="float64",
+) -> ndarray:
+    """
+    Returns the electric field at each point of points as an (M, 2) array.
+
+    positions: (N, 2) array with the charges positions
+    charges: (N,) array with the charges in coulomb
+    points: (M, 2) array with the points where the field is evaluated
+
+    The (M, N, 2) displacement tensor is never built at once. Points are
+    processed in chunks so that a chunk times the number of charges does
+    not exceed MAX_CHUNK_ELEMENTS, which keeps memory bounded no matter how
+    many points or charges there are. A point placed exactly on a charge
+    gets no contribution from that charge.
+
+    dtype is the precision of the computation and of the result, one of
+    PRECISIONS (see get_charge_unit).
+    """
+    positions, charges, unit = to_precision(positions, charges, dtype)
+    points = asarray(points, dtype=dtype).reshape(-1, 2)
+    field = empty(points.shape, dtype=dtype)
+    if not len(charges):
+        field.fill(0.0)
+        return field
+
+    coulomb_const = field.dtype.type(constants.COULOMB_CONST * unit)
+    chunk_size = get_chunk_size(len(charges), chunk_size)
+    for start in range(0, len(points), chunk_size):
+        chunk = points[start : start + chunk_size]
+        field[start : start + chunk_size] = _electric_field_chunk(
+            positions, charges, chunk, coulomb_const
+        )
+    return field
+
+
+def get_charge_unit(dtype) -> float:
+    """
+    Returns the unit, in coulomb, in which the kernels express charges when
+    they compute in dtype.
+
+    float64 kernels work in coulomb. Single precision ones work in
+    elementary charges and fold the elementary charge into the Coulomb
+    constant, which keeps every intermediate value (charges are around
+    1e-19 C and k * e ** 2 around 1e-28) far from the float32 limits. The
+    results are always returned in SI units.
+    """
+    if data_type(dtype).name not in PRECISIONS:
+        raise ValueError(
+            f"unsupported precision '{dtype}', "
+            f"available precisions: {', '.join(PRECISIONS)}"
+        )
+    if data_type(dtype) == float64:
+        return 1.0
+    return constants.ELEMENTARY_CHARGE
+
+
+def to_precision(positions: ndarray, charges: ndarray, dtype) -> tuple:
+    """
+    Returns positions and charges as dtype arrays, with the charges
+    expressed in the unit of get_charge_unit, and that unit.
+    """
+    unit = get_charge_unit(dtype)
+    positions = asarray(positions, dtype=dtype).reshape(-1, 2)
+    charges = asarray(charges, dtype=float).reshape(-1)
+    if unit != 1.0:
+        charges = charges / unit
+    return positions, charges.astype(dtype, copy=False), unit
+
+
+def get_chunk_size(charges_count: int, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    Returns the number of points electric_field evaluates at once for the
+    given number of charges.
+    """
+    return max(1, min(chunk_size, MAX_CHUNK_ELEMENTS // max(charges_count, 1)))
+
+
+def _electric_field_chunk(
+    positions: ndarray, charges: ndarray, points: ndarray, coulomb_const: float
+) -> ndarray:
+    """
+    Returns the electric field at points by broadcasting the displacement
+    from every point to every charge.
+    """
+    r_vectors = points[:, newaxis, :] - positions[newaxis, :, :]
+    r_squared = einsum("ijk,ijk->ij", r_vectors, r_vectors)
+    r_squared[r_squared == 0] = float("inf")
+    weights = charges / (r_squared * r_squared**0.5)
+    return coulomb_const * einsum("ij,ijk->ik", weights, r_vectors)
+
+
+def electric_potential(
+    positions: ndarray,
+    charges: ndarray,
+    points: ndarray,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    dtype="float64",
+) -> ndarray:
+    """
+    Returns the electric potential (in volts) at each point of points as an
+    (M,) array. Points are processed in chunks like in electric_field, and a
+    point placed exactly on a charge gets no contribution from that charge.
+    """
+    positions, charges, unit = to_precision(positions, charges, dtype)
+    points = asarray(points, dtype=dtype).reshape(-1, 2)
+    potential = zeros(len(points), dtype=dtype)
+    if not len(charges):
+        return potential
+
+    chunk_size = get_chunk_size(len(charges), chunk_size)
+    for start in range(0, len(points), chunk_size):
+        chunk = points[start : start + chunk_size]
+        r_vectors = chunk[:, newaxis, :] - positions[newaxis, :, :]
+        r_squared = einsum("ijk,ijk->ij", r_vectors, r_vectors)
+        r_squared[r_squared == 0] = float("inf")
+        potential[start : start + chunk_size] = (charges / r_squared**0.5).sum(1)
+    return potential.dtype.type(constants.COULOMB_CONST * unit) * potential
+
+
+def electric_forces(
+    positions: ndarray,
+    charges: ndarray,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    start: int = 0,
+    stop: int = None,
+    dtype="float64",
+) -> ndarray:
+    """
+    Returns an (N, 2) array with the electric force exerted on each charge
+    by all the other charges.
+
+    The (N, N, 2) pairwise displacement tensor is split into tiles of
+    block_size x block_size pairs, so peak memory is O(block_size ** 2)
+    instead of O(N ** 2). The diagonal of the tiles that overlap is
+    masked so that a charge exerts no force on itself.
+
+    If start or stop are given only the forces on the charges [start, stop)
+    are returned. start must be a multiple of block_size, so that the tiles
+    and the results are exactly the same ones of a full call.
+    """
+    positions, charges, unit = to_precision(positions, charges, dtype)
+    stop = len(charges) if stop is None else min(stop, len(charges))
+    fields = zeros((max(stop - start, 0), 2), dtype=dtype)
+    for i in range(start, stop, block_size):
+        targets = positions[i : min(i + block_size, stop)]
+        rows = slice(i - start, i - start + len(targets))
+        for j in range(0, len(charges), block_size):
+            r_vectors = targets[:, newaxis, :] - positions[newaxis, j : j + block_size]
+            r_squared = einsum("ijk,ijk->ij", r_vectors, r_vectors)
+            if i == j:
+                diagonal = arange(len(r_squared))
+                r_squared[diagonal, diagonal] = float("inf")
+            r_squared[r_squared == 0] = float("inf")
+            weights = charges[j : j + block_size] / (r_squared * r_squared**0.5)
+            fields[rows] += einsum("ij,ijk->ik", weights, r_vectors)
+    coulomb_const = fields.dtype.type(constants.COULOMB_CONST * unit * unit)
+    return coulomb_const * fields * charges[start:stop, newaxis]
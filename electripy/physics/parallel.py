@@ -0,0 +1,203 @@
+from numpy import ndarray, asarray, empty, dtype as data_type
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from os import cpu_count
+from math import prod
+from electripy.physics import kernels
+
+
+class ParallelSolver:
+    DEFAULT_TILE_SIZE = 16384
+    EXECUTORS = ("thread", "process")
+
+    def __init__(
+        self,
+        workers: int = None,
+        tile_size: int = DEFAULT_TILE_SIZE,
+        executor: str = "thread",
+        chunk_size: int = kernels.DEFAULT_CHUNK_SIZE,
+        block_size: int = kernels.DEFAULT_BLOCK_SIZE,
+        dtype="float64",
+    ) -> None:
+        """
+        Computes fields and forces with the direct summation kernels, split
+        in tiles that run on a pool of workers.
+
+        Field points (for instance the window grid) are split in tiles of
+        about tile_size points and forces are split in blocks of charges.
+        Tiles are aligned to the chunks and blocks the serial kernels use,
+        so every value is computed by exactly the same operations and the
+        results match the numpy backend bit for bit.
+
+        executor is "thread" (numpy releases the GIL inside its kernels) or
+        "process". Processes read positions, charges and points from shared
+        memory and write their tiles straight into a shared output array,
+        so nothing but the tile bounds is pickled. workers defaults to the
+        number of CPUs. Call close (or use the solver as a context manager)
+        to shut the pool down. dtype is the precision of the kernels (see
+        electripy.physics.kernels.PRECISIONS).
+        """
+        if executor not in ParallelSolver.EXECUTORS:
+            raise ValueError(
+                f"unknown executor '{executor}', "
+                f"available executors: {', '.join(ParallelSolver.EXECUTORS)}"
+            )
+        self.workers = workers or cpu_count() or 1
+        self.tile_size = tile_size
+        self.executor = executor
+        self.chunk_size = chunk_size
+        self.block_size = block_size
+        kernels.get_charge_unit(dtype)
+        self.dtype = data_type(dtype)
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            if self.executor == "thread":
+                self._pool = ThreadPoolExecutor(self.workers)
+            else:
+                self._pool = ProcessPoolExecutor(self.workers)
+        return self._pool
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _get_tiles(self, size: int, unit: int) -> list[tuple[int, int]]:
+        """
+        Splits range(size) in (start, stop) tiles whose length is a
+        multiple of unit.
+        """
+        tile_size = max(unit, self.tile_size // unit * unit)
+        return [
+            (start, min(start + tile_size, size)) for start in range(0, size, tile_size)
+        ]
+
+    def electric_field(
+        self, positions: ndarray, charges: ndarray, points: ndarray
+    ) -> ndarray:
+        positions = asarray(positions, dtype=float).reshape(-1, 2)
+        charges = asarray(charges, dtype=float).reshape(-1)
+        points = asarray(points, dtype=float).reshape(-1, 2)
+        unit = kernels.get_chunk_size(len(charges), self.chunk_size)
+        tiles = self._get_tiles(len(points), unit)
+        return self._run(
+            _field_tile, (positions, charges, points), (len(points), 2), tiles
+        )
+
+    def electric_forces(self, positions: ndarray, charges: ndarray) -> ndarray:
+        positions = asarray(positions, dtype=float).reshape(-1, 2)
+        charges = asarray(charges, dtype=float).reshape(-1)
+        tiles = self._get_tiles(len(charges), self.block_size)
+        return self._run(_forces_tile, (positions, charges), (len(charges), 2), tiles)
+
+    def _run(self, task, inputs: tuple, shape: tuple, tiles: list) -> ndarray:
+        """
+        Runs task on every tile and returns the output array. task(inputs,
+        output, start, stop, options) must fill output[start:stop].
+        """
+        options = (self.chunk_size, self.block_size, self.dtype)
+        if len(tiles) <= 1 or self.workers == 1:
+            output = empty(shape, dtype=self.dtype)
+            for start, stop in tiles:
+                task(inputs, output, start, stop, options)
+            return output
+
+        pool = self._get_pool()
+        if self.executor == "thread":
+            output = empty(shape, dtype=self.dtype)
+            futures = [
+                pool.submit(task, inputs, output, start, stop, options)
+                for start, stop in tiles
+            ]
+            for future in futures:
+                future.result()
+            return output
+
+        blocks = [_SharedArray.copy_of(array) for array in inputs]
+        result = _SharedArray.create(shape, self.dtype)
+        try:
+            specs = tuple(block.spec for block in blocks)
+            futures = [
+                pool.submit(
+                    _shared_task, task, specs, result.spec, start, stop, options
+                )
+                for start, stop in tiles
+            ]
+            for future in futures:
+                future.result()
+            return result.array.copy()
+        finally:
+            for block in blocks + [result]:
+                block.release()
+
+
+def _field_tile(inputs: tuple, output: ndarray, start: int, stop: int, options):
+    positions, charges, points = inputs
+    chunk_size, _, precision = options
+    output[start:stop] = kernels.electric_field(
+        positions, charges, points[start:stop], chunk_size, precision
+    )
+
+
+def _forces_tile(inputs: tuple, output: ndarray, start: int, stop: int, options):
+    positions, charges = inputs
+    _, block_size, precision = options
+    output[start:stop] = kernels.electric_forces(
+        positions, charges, block_size, start, stop, precision
+    )
+
+
+def _shared_task(task, specs: tuple, output_spec: tuple, start, stop, options):
+    """
+    Runs task in a worker process on arrays attached from shared memory.
+    """
+    blocks = [_SharedArray.attach(spec) for spec in specs]
+    output = _SharedArray.attach(output_spec)
+    try:
+        task(tuple(block.array for block in blocks), output.array, start, stop, options)
+    finally:
+        for block in blocks + [output]:
+            block.close()
+
+
+class _SharedArray:
+    def __init__(self, memory: shared_memory.SharedMemory, shape, type_, owner):
+        self.memory = memory
+        self.array = ndarray(shape, dtype=type_, buffer=memory.buf)
+        self.spec = (memory.name, shape, str(type_))
+        self._owner = owner
+
+    @staticmethod
+    def create(shape: tuple, type_=float) -> "_SharedArray":
+        size = max(data_type(type_).itemsize * prod(shape), 1)
+        memory = shared_memory.SharedMemory(create=True, size=size)
+        return _SharedArray(memory, shape, data_type(type_), True)
+
+    @staticmethod
+    def copy_of(array: ndarray) -> "_SharedArray":
+        shared = _SharedArray.create(array.shape, array.dtype)
+        shared.array[...] = array
+        return shared
+
+    @staticmethod
+    def attach(spec: tuple) -> "_SharedArray":
+        name, shape, type_ = spec
+        memory = shared_memory.SharedMemory(name=name)
+        return _SharedArray(memory, shape, data_type(type_), False)
+
+    def close(self) -> None:
+        del self.array
+        self.memory.close()
+
+    def release(self) -> None:
+        self.close()
+        if self._owner:
+            self.memory.unlink()
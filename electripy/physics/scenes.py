@@ -0,0 +1,160 @@
+from numpy import ndarray, loadtxt, savetxt, column_stack, frombuffer
+from numpy.lib import format as npy
+from electripy.physics.charge_distribution import ChargeDistribution
+from itertools import islice
+from math import prod
+from typing import Iterator, IO
+import zipfile
+
+
+# A scene is a charge distribution stored in a file. Its format is given by
+# the suffix of the file:
+#
+#     .npz: the columns positions (N, 2), charges (N,) and kinds (N,), the
+#     PointCharge.KIND of each charge, as uncompressed .npy members. kinds is
+#     optional.
+#     .txt, .csv: one charge per line with its x, y, charge and kind,
+#     separated by spaces or commas. Lines starting with # are comments and
+#     the kind may be left out.
+#
+# Scenes are read in chunks of CHUNK_SIZE charges that go straight into the
+# arrays of the ChargeDistribution (see ChargeDistribution.add_charges), so
+# no PointCharge object is created and the file is never held in memory.
+CHUNK_SIZE = 2**16
+COLUMNS = ("positions", "charges", "kinds")
+TEXT_HEADER = "x y charge kind"
+DELIMITERS = {".txt": " ", ".csv": ","}
+
+
+def save_scene(charge_distribution: ChargeDistribution, path: str) -> None:
+    """Writes the charges of charge_distribution to the scene file path."""
+    columns = (
+        charge_distribution.positions,
+        charge_distribution.charges,
+        charge_distribution.kinds,
+    )
+    suffix = _get_suffix(path)
+    if suffix == ".npz":
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED) as file:
+            for name, column in zip(COLUMNS, columns):
+                with file.open(f"{name}.npy", "w", force_zip64=True) as member:
+                    npy.write_array(member, column, allow_pickle=False)
+        return
+
+    positions, charges, kinds = columns
+    with open(path, "w") as file:
+        for start in range(0, len(charges), CHUNK_SIZE):
+            end = start + CHUNK_SIZE
+            savetxt(
+                file,
+                column_stack(
+                    (positions[start:end], charges[start:end], kinds[start:end])
+                ),
+                fmt=("%.17g", "%.17g", "%.17g", "%d"),
+                delimiter=DELIMITERS[suffix],
+                header=TEXT_HEADER if start == 0 else "",
+            )
+
+
+def load_scene(path: str, solver=None, backend="auto") -> ChargeDistribution:
+    """
+    Returns a ChargeDistribution with the charges of the scene file path.
+    solver and backend are passed to the ChargeDistribution.
+    """
+    distribution = ChargeDistribution(solver, backend)
+    for positions, charges, kinds in read_scene(path):
+        distribution.add_charges(positions, charges, kinds)
+    return distribution
+
+
+def read_scene(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[tuple]:
+    """
+    Yields the charges of the scene file path as (positions, charges,
+    kinds) chunks of at most chunk_size charges. kinds is None if the scene
+    does not have them.
+    """
+    suffix = _get_suffix(path)
+    if suffix == ".npz":
+        yield from _read_binary(path, chunk_size)
+    else:
+        yield from _read_text(path, chunk_size, DELIMITERS[suffix])
+
+
+def _get_suffix(path: str) -> str:
+    for suffix in (".npz",) + tuple(DELIMITERS):
+        if str(path).lower().endswith(suffix):
+            return suffix
+    raise ValueError(
+        f"unknown scene format '{path}', available formats: "
+        f".npz, {', '.join(DELIMITERS)}"
+    )
+
+
+def _read_binary(path: str, chunk_size: int) -> Iterator[tuple]:
+    with zipfile.ZipFile(path) as file:
+        names = file.namelist()
+        members = [
+            file.open(f"{name}.npy") if f"{name}.npy" in names else None
+            for name in COLUMNS
+        ]
+        try:
+            if members[0] is None or members[1] is None:
+                raise ValueError(f"scene '{path}' has no positions or charges")
+            headers = [
+                _read_npy_header(member) if member is not None else None
+                for member in members
+            ]
+            sizes = {header[0][0] for header in headers if header is not None}
+            if len(sizes) != 1:
+                raise ValueError(f"the columns of scene '{path}' differ in length")
+            size = sizes.pop()
+            for start in range(0, size, chunk_size):
+                count = min(chunk_size, size - start)
+                yield tuple(
+                    _read_rows(member, header, count) if member is not None else None
+                    for member, header in zip(members, headers)
+                )
+        finally:
+            for member in members:
+                if member is not None:
+                    member.close()
+
+
+def _read_npy_header(file: IO) -> tuple:
+    """
+    Reads the header of the .npy file and returns its shape and dtype.
+    """
+    version = npy.read_magic(file)
+    if version == (1, 0):
+        shape, fortran_order, data_type = npy.read_array_header_1_0(file)
+    else:
+        shape, fortran_order, data_type = npy.read_array_header_2_0(file)
+    if fortran_order and len(shape) > 1:
+        raise ValueError("scene columns must be stored in C order")
+    return shape, data_type
+
+
+def _read_rows(file: IO, header: tuple, count: int) -> ndarray:
+    """Reads the next count rows of the .npy file which header is given."""
+    shape, data_type = header
+    row_size = prod(shape[1:])
+    buffer = file.read(count * row_size * data_type.itemsize)
+    return frombuffer(buffer, data_type).reshape((count,) + shape[1:])
+
+
+def _read_text(path: str, chunk_size: int, delimiter: str) -> Iterator[tuple]:
+    with open(path) as file:
+        lines = (line for line in file if line.strip() and not line.startswith("#"))
+        while True:
+            chunk = list(islice(lines, chunk_size))
+            if not chunk:
+                return
+            rows = loadtxt(
+                chunk, delimiter=None if delimiter == " " else delimiter, ndmin=2
+            )
+            if rows.shape[1] not in (3, 4):
+                raise ValueError(
+                    f"scene '{path}' lines must have x, y, charge and kind"
+                )
+            kinds = rows[:, 3].astype(int) if rows.shape[1] == 4 else None
+            yield rows[:, :2], rows[:, 2], kinds
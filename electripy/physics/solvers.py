@@ -0,0 +1,59 @@
+from numpy import ndarray
+from electripy.physics.backends import get_backend
+from electripy.physics.barnes_hut import BarnesHutSolver
+from electripy.physics.fmm import FMMSolver
+from electripy.physics.parallel import ParallelSolver
+
+
+class DirectSolver:
+    def __init__(self, backend="auto", dtype="float64") -> None:
+        """
+        Computes fields and forces exactly by summing the contribution of
+        every charge. This is the default solver of ChargeDistribution.
+
+        backend runs the summations: a backend name (see
+        electripy.physics.backends) or a backend instance. "auto" picks the
+        fastest available backend for each problem size. dtype is the
+        precision of the backend created from a name (see
+        electripy.physics.kernels.PRECISIONS).
+        """
+        if isinstance(backend, str):
+            backend = get_backend(backend, dtype=dtype)
+        self.backend = backend
+
+    def electric_field(
+        self, positions: ndarray, charges: ndarray, points: ndarray
+    ) -> ndarray:
+        return self.backend.electric_field(positions, charges, points)
+
+    def electric_forces(self, positions: ndarray, charges: ndarray) -> ndarray:
+        return self.backend.electric_forces(positions, charges)
+
+    def electric_potential(
+        self, positions: ndarray, charges: ndarray, points: ndarray
+    ) -> ndarray:
+        return self.backend.electric_potential(positions, charges, points)
+
+
+# A solver is any object with the following methods:
+#
+#     electric_field(positions, charges, points) -> (M, 2) array
+#     electric_forces(positions, charges) -> (N, 2) array
+SOLVERS = {
+    "direct": DirectSolver,
+    "barnes-hut": BarnesHutSolver,
+    "fmm": FMMSolver,
+    "parallel": ParallelSolver,
+}
+
+
+def get_solver(name: str, **kwargs):
+    """
+    Returns a new instance of the solver registered as name. kwargs are
+    passed to the solver constructor.
+    """
+    if name not in SOLVERS:
+        raise ValueError(
+            f"unknown solver '{name}', available solvers: {', '.join(SOLVERS)}"
+        )
+    return SOLVERS[name](**kwargs)
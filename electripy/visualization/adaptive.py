@@ -0,0 +1,264 @@
+from numpy import (
+    ndarray,
+    arange,
+    meshgrid,
+    column_stack,
+    concatenate,
+    stack,
+    unique,
+    isin,
+    searchsorted,
+    argsort,
+    bincount,
+    cumsum,
+    empty,
+    errstate,
+    log10,
+    nan_to_num,
+    inf,
+    int64,
+    full,
+    where,
+    tile,
+    ones,
+    zeros,
+    maximum,
+    minimum,
+)
+from numpy.linalg import norm
+from math import ceil
+from typing import Callable
+
+
+class QuadtreeSampler:
+    MAGNITUDE_WEIGHT = 0.5
+    MAX_VARIATION = 1.0
+    BATCH_DIVISOR = 4
+
+    def __init__(self, min_spacing: int, depth: int = 3, tolerance: float = 0.02):
+        """
+        A QuadtreeSampler instance samples a field on the corners of the
+        cells of a quadtree. The root cells are min_spacing * 2**depth
+        pixels wide and the smallest ones min_spacing pixels, so every
+        sample lies on the lattice of spacing min_spacing.
+
+        A cell is split in four when the field changes too much between its
+        corners, that is when
+
+            1 - |mean of the unit vectors| + MAGNITUDE_WEIGHT * log10(max / min)
+
+        is greater than tolerance, where max and min are the greatest and
+        smallest norm of the corners. So the far field, which is smooth, is
+        sampled sparsely and the samples gather around the charges, where
+        the direction of the field turns fast.
+        """
+        self.min_spacing = min_spacing
+        self.depth = depth
+        self.tolerance = tolerance
+
+    def get_lattice_shape(self, size: tuple) -> tuple[int, int]:
+        """Returns the number of columns and rows of the sampling lattice."""
+        root = 2**self.depth
+        w, h = size
+        return (
+            ceil(w / (self.min_spacing * root)) * root + 1,
+            ceil(h / (self.min_spacing * root)) * root + 1,
+        )
+
+    def sample(
+        self,
+        size: tuple,
+        field_function: Callable,
+        budget: int,
+        restricted: ndarray = None,
+    ) -> tuple[ndarray, ndarray]:
+        """
+        Returns the (M, 2) sample positions and the field at each of them,
+        in lattice column order. M is at most budget, but the corners of
+        the root cells are always sampled.
+
+        Cells are split in rounds while the budget allows. Each round
+        splits the BATCH_DIVISOR-th part of the cells above tolerance with
+        the greatest variation times width, and evaluates the new samples
+        with a single call to field_function. restricted is an optional
+        boolean array of the lattice shape (see get_lattice_shape) that is
+        True where nothing is drawn (inside the charges): restricted corners
+        are left out of the variation, and cells with no unrestricted
+        lattice point, like the ones out of the window, are never split.
+        """
+        columns, rows = self.get_lattice_shape(size)
+        root = 2**self.depth
+        xs, ys = meshgrid(
+            arange(0, columns - 1, root), arange(0, rows - 1, root), indexing="ij"
+        )
+        cells = column_stack((xs.ravel(), ys.ravel())).astype(int64)
+        sizes = full(len(cells), root, dtype=int64)
+        seen = None
+        if restricted is not None:
+            # Summed area table of the unrestricted lattice points.
+            seen = zeros((columns + 1, rows + 1), dtype=int64)
+            seen[1:, 1:] = cumsum(cumsum(~restricted, axis=0), axis=1)
+
+        keys = empty(0, dtype=int64)
+        vectors = empty((0, 2))
+        corners = self._get_corners(cells, sizes, rows)
+        keys, vectors = self._evaluate(keys, vectors, corners, field_function, rows)
+        variation = self._get_cells_variation(
+            cells, sizes, keys, vectors, size, restricted, seen
+        )
+
+        while True:
+            priority = where(
+                (sizes > 1) & (variation > self.tolerance),
+                variation * sizes,
+                0,
+            )
+            candidates = argsort(-priority, kind="stable")
+            candidates = candidates[priority[candidates] > 0]
+            candidates = candidates[: max(len(candidates) // self.BATCH_DIVISOR, 1)]
+            new_points = self._get_midpoints(cells[candidates], sizes[candidates], rows)
+            selected = self._fit_budget(new_points, keys, budget - len(keys))
+            if not selected:
+                break
+            keys, vectors = self._evaluate(
+                keys, vectors, new_points[:selected], field_function, rows
+            )
+
+            split = candidates[:selected]
+            half = sizes[split] // 2
+            children = concatenate(
+                [
+                    cells[split] + column_stack((half * dx, half * dy))
+                    for dx, dy in ((0, 0), (1, 0), (0, 1), (1, 1))
+                ]
+            )
+            children_sizes = tile(half, 4)
+            children_variation = self._get_cells_variation(
+                children, children_sizes, keys, vectors, size, restricted, seen
+            )
+
+            kept = ones(len(cells), dtype=bool)
+            kept[split] = False
+            cells = concatenate((cells[kept], children))
+            sizes = concatenate((sizes[kept], children_sizes))
+            variation = concatenate((variation[kept], children_variation))
+
+        points = column_stack((keys // rows, keys % rows)) * float(self.min_spacing)
+        return points, vectors
+
+    def _get_cells_variation(
+        self, cells, sizes, keys, vectors, size: tuple, restricted, seen
+    ) -> ndarray:
+        """
+        Returns the variation of the field between the corners of each
+        cell. Restricted corners are left out, and the cells that cannot be
+        seen (out of the window or with every lattice point restricted,
+        counted with the summed area table seen) get 0.
+        """
+        w, h = size
+        rows = self.get_lattice_shape(size)[1]
+        corners = self._get_corners(cells, sizes, rows)
+        hidden = None
+        if restricted is not None:
+            hidden = restricted.ravel()[corners]
+        variation = get_variation(vectors[searchsorted(keys, corners)], hidden)
+        outside = (cells[:, 0] * self.min_spacing >= w) | (
+            cells[:, 1] * self.min_spacing >= h
+        )
+        variation[outside] = 0
+        if seen is not None:
+            x, y = cells[:, 0], cells[:, 1]
+            x_end, y_end = x + sizes + 1, y + sizes + 1
+            visible = seen[x_end, y_end] - seen[x, y_end] - seen[x_end, y] + seen[x, y]
+            variation[visible == 0] = 0
+        return variation
+
+    @staticmethod
+    def _get_corners(cells: ndarray, sizes: ndarray, rows: int) -> ndarray:
+        """Returns the (K, 4) lattice keys of the corners of the cells."""
+        x, y, cell_size = cells[:, 0], cells[:, 1], sizes
+        return stack(
+            (
+                x * rows + y,
+                (x + cell_size) * rows + y,
+                x * rows + y + cell_size,
+                (x + cell_size) * rows + y + cell_size,
+            ),
+            axis=1,
+        )
+
+    @staticmethod
+    def _get_midpoints(cells: ndarray, sizes: ndarray, rows: int) -> ndarray:
+        """
+        Returns the (K, 5) lattice keys a split adds to each cell: its
+        center and the middle of its four sides.
+        """
+        x, y, half = cells[:, 0], cells[:, 1], sizes // 2
+        return stack(
+            (
+                (x + half) * rows + y + half,
+                (x + half) * rows + y,
+                x * rows + y + half,
+                (x + 2 * half) * rows + y + half,
+                (x + half) * rows + y + 2 * half,
+            ),
+            axis=1,
+        )
+
+    @staticmethod
+    def _fit_budget(new_points: ndarray, keys: ndarray, remaining: int) -> int:
+        """
+        Returns how many of the cells, in order, can be split without
+        evaluating more than remaining new points. Points shared with an
+        earlier cell or already evaluated are only counted once.
+        """
+        if not len(new_points) or remaining <= 0:
+            return 0
+        flat = new_points.ravel()
+        _, first = unique(flat, return_index=True)
+        first = first[~isin(flat[first], keys)]
+        added = cumsum(bincount(first // 5, minlength=len(new_points)))
+        return int(searchsorted(added, remaining, side="right"))
+
+    def _evaluate(self, keys, vectors, new_keys, field_function, rows: int):
+        """
+        Evaluates field_function at the lattice keys not evaluated yet and
+        returns the sorted keys and their vectors.
+        """
+        new_keys = unique(new_keys)
+        new_keys = new_keys[~isin(new_keys, keys)]
+        if not len(new_keys):
+            return keys, vectors
+        points = column_stack((new_keys // rows, new_keys % rows)) * float(
+            self.min_spacing
+        )
+        keys = concatenate((keys, new_keys))
+        vectors = concatenate((vectors, field_function(points)))
+        order = argsort(keys, kind="stable")
+        return keys[order], vectors[order]
+
+
+def get_variation(corners: ndarray, hidden: ndarray = None) -> ndarray:
+    """
+    Returns how much the field changes between the (K, 4, 2) corner
+    vectors of each cell, leaving out the corners where hidden is True.
+    Cells with a non finite or zero corner, or with less than two
+    corners seen, get QuadtreeSampler.MAX_VARIATION, the greatest
+    variation.
+    """
+    if hidden is None:
+        hidden = zeros(corners.shape[:2], dtype=bool)
+    seen = ~hidden
+    count = maximum(seen.sum(axis=1), 1)
+    with errstate(divide="ignore", invalid="ignore"):
+        norms = norm(corners, axis=2)
+        units = corners / norms[..., None]
+        units[hidden] = 0
+        spread = 1 - norm(units.sum(axis=1), axis=1) / count
+        greatest = where(seen, norms, 0).max(axis=1)
+        smallest = where(seen, norms, inf).min(axis=1)
+        ratio = log10(greatest / smallest)
+        variation = spread + QuadtreeSampler.MAGNITUDE_WEIGHT * ratio
+    # One corner or none tells nothing about the rest of the cell.
+    variation[seen.sum(axis=1) <= 1] = inf
+    return minimum(nan_to_num(variation, nan=inf), QuadtreeSampler.MAX_VARIATION)
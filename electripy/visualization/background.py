@@ -0,0 +1,62 @@
+from threading import Thread, Event
+from queue import SimpleQueue, Empty
+
+
+class BackgroundJob:
+    def __init__(self, key) -> None:
+        """
+        A BackgroundJob instance runs the _work method of its subclass on a
+        daemon thread. key identifies what the job computes, so that a job
+        for data that changed since it started can be told apart.
+
+        _work hands its results to the main thread with _publish, and
+        whoever started the job collects them with results(). A cancelled
+        job sets _cancelled, which _work checks to stop early.
+        """
+        self.key = key
+        self._results = SimpleQueue()
+        self._cancelled = Event()
+        self._finished = Event()
+        self._thread = Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def done(self) -> bool:
+        return self._finished.is_set()
+
+    def wait(self, timeout: float) -> bool:
+        """Waits up to timeout seconds for the job to finish."""
+        return self._finished.wait(timeout)
+
+    def results(self) -> list:
+        """
+        Returns the results published since the last call, in order.
+        Errors raised on the background thread are raised again here.
+        """
+        results = []
+        while True:
+            try:
+                result = self._results.get_nowait()
+            except Empty:
+                return results
+            if isinstance(result, Exception):
+                raise result
+            results.append(result)
+
+    def _publish(self, result) -> None:
+        self._results.put(result)
+
+    def _run(self) -> None:
+        try:
+            self._work()
+        except Exception as error:
+            self._results.put(error)
+        finally:
+            self._finished.set()
+
+    def _work(self) -> None:
+        raise NotImplementedError
@@ -1,3 +1,6 @@
+from numpy import ndarray, zeros, column_stack
+
+
 BLACK = (0, 0, 0)
 BLUE = (54, 74, 255)
 RED = (255, 54, 54)
@@ -44,3 +47,19 @@ class RedBlueColorGenerator:
             return (0, 0, 0)
         normalized_value = value / self.max_value
         return (255 * normalized_value, 0, brightness - brightness * normalized_value)
+
+    def get_colors(self, values: ndarray, brightness: int) -> ndarray:
+        """
+        Returns an (M, 3) array with the color of each value. It is the
+        vectorized version of get_color.
+        """
+        if self.max_value == 0:
+            return zeros((len(values), 3))
+        normalized_values = values / self.max_value
+        return column_stack(
+            (
+                255 * normalized_values,
+                zeros(len(values)),
+                brightness - brightness * normalized_values,
+            )
+        )
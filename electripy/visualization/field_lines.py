@@ -0,0 +1,298 @@
+from numpy import (
+    ndarray,
+    arange,
+    column_stack,
+    concatenate,
+    repeat,
+    cos,
+    sin,
+    pi,
+    sign,
+    rint,
+    zeros,
+    zeros_like,
+    divide,
+    hypot,
+    full,
+    ones,
+    flatnonzero,
+    argsort,
+    bincount,
+    cumsum,
+    split,
+    isfinite,
+    log10,
+    abs as absolute,
+    minimum,
+    maximum,
+    errstate,
+    int64,
+)
+from numpy.linalg import norm
+from electripy.visualization.spatial_hash import SpatialHashMask
+from electripy.visualization.background import BackgroundJob
+from threading import Event
+from typing import Callable
+
+
+class FieldLineTracer:
+    MIN_STEP = 0.5
+    MAX_STEP = 64.0
+    GROWTH = 2.0
+    SHRINK = 0.25
+    SAFETY = 0.9
+    MAGNITUDE_WEIGHT = 0.5
+    DISK_SPACING = 4
+    MIN_LINES = 1
+    STALL = 0.25
+
+    def __init__(
+        self,
+        lines_per_charge: int = 12,
+        max_lines: int = 300,
+        radius: int = 20,
+        tolerance: float = 0.2,
+        max_steps: int = 500,
+    ) -> None:
+        """
+        A FieldLineTracer instance traces the field lines of point charges.
+        lines_per_charge lines start evenly spread on a circle of radius
+        pixels around each charge, and they follow the field away from the
+        positive charges and against it away from the negative ones. With
+        many charges fewer lines start from each one, so that there are
+        about max_lines lines in all (but never fewer than MIN_LINES per
+        charge).
+
+        Every line is integrated at once along the direction of the field
+        with a vectorized third order Runge-Kutta (Bogacki-Shampine), so
+        each stage of a step is a single call to the batched field function
+        for all the lines still running. Its last stage is the field at the
+        end of the step, which is the first stage of the next one, so a step
+        takes three calls (and a step taken again none for its start).
+
+        Each line has its own step length, which is scaled after every step
+        by SAFETY * tolerance / change (between SHRINK and GROWTH, and kept
+        between MIN_STEP and MAX_STEP). The step is taken again, shorter,
+        when the change was over tolerance. The change is measured like
+        QuadtreeSampler measures the variation of its cells:
+
+            |k1 - k4| + MAGNITUDE_WEIGHT * |log10(|E4| / |E1|)|
+
+        k1 and k4 being the directions at the start and the end of the step
+        and E1, E4 the field there, and it must stay under tolerance.
+
+        A line ends when it reaches a charge of the opposite sign (gets
+        closer than radius to it, to within DISK_SPACING pixels), leaves
+        the window, finds no field (turns back or moves less than STALL
+        times its step) or takes max_steps steps. Lines of negative charges
+        that end at a positive charge are dropped, since one of the lines of
+        that charge already follows them.
+        """
+        self.lines_per_charge = lines_per_charge
+        self.max_lines = max_lines
+        self.radius = radius
+        self.tolerance = tolerance
+        self.max_steps = max_steps
+
+    def trace(
+        self,
+        positions: ndarray,
+        charges: ndarray,
+        field_function: Callable,
+        size: tuple,
+        cancelled: Event = None,
+    ) -> list[ndarray]:
+        """
+        Returns the (K, 2) points of every field line of the charges in a
+        window of the given size. field_function must return the (M, 2)
+        field at an (M, 2) array of points. If cancelled is given, tracing
+        stops at the next step once it is set and None is returned.
+        """
+        w, h = size
+        inside = (
+            (positions[:, 0] >= 0)
+            & (positions[:, 0] < w)
+            & (positions[:, 1] >= 0)
+            & (positions[:, 1] < h)
+            & (charges != 0)
+        )
+        positions, charges = positions[inside], charges[inside]
+        if not len(charges):
+            return []
+
+        # Lines away from positive charges end next to negative ones and
+        # the other way around.
+        ends = {
+            1: self._get_disks(positions[charges < 0], size),
+            -1: self._get_disks(positions[charges > 0], size),
+        }
+
+        count = max(
+            min(self.lines_per_charge, self.max_lines // len(charges)),
+            FieldLineTracer.MIN_LINES,
+        )
+        angles = 2 * pi * (arange(count) + 0.5) / count
+        offsets = column_stack((cos(angles), sin(angles))) * self.radius
+        points = (positions[:, None] + offsets[None]).reshape(-1, 2)
+        directions = repeat(sign(charges), count)
+        steps = full(len(points), float(self.radius) / 2)
+        running = ones(len(points), dtype=bool)
+        reached = zeros(len(points), dtype=bool)
+        previous = zeros((len(points), 2))
+
+        # The field at the current point of every line.
+        fields = field_function(points)
+
+        lines = [arange(len(points))]
+        history = [points.copy()]
+        for _ in range(self.max_steps):
+            if cancelled is not None and cancelled.is_set():
+                return None
+            active = flatnonzero(running)
+            direction = directions[active][:, None]
+            k1 = self._get_direction(fields[active]) * direction
+            # A line turning back is stuck where the field vanishes.
+            turned = (k1 * previous[active]).sum(axis=1) < 0
+            running[active[turned]] = False
+            active, k1 = active[~turned], k1[~turned]
+            if not len(active):
+                break
+            start = points[active]
+            step = steps[active][:, None]
+            direction = direction[~turned]
+
+            k2 = self._get_direction(field_function(start + step / 2 * k1)) * direction
+            middle = start + step * 3 / 4 * k2
+            k3 = self._get_direction(field_function(middle)) * direction
+            new = start + step * (2 / 9 * k1 + 1 / 3 * k2 + 4 / 9 * k3)
+            end_field = field_function(new)
+            k4 = self._get_direction(end_field) * direction
+
+            with errstate(divide="ignore", invalid="ignore"):
+                ratio = log10(norm(end_field, axis=1) / norm(fields[active], axis=1))
+            change = norm(k1 - k4, axis=1) + self.MAGNITUDE_WEIGHT * absolute(ratio)
+            change[~isfinite(change)] = 0
+            # The stages cancel out around a point where the field vanishes.
+            finite = isfinite(new).all(axis=1) & (
+                norm(new - start, axis=1) >= FieldLineTracer.STALL * step[:, 0]
+            )
+
+            accepted = (change <= self.tolerance) | (
+                steps[active] <= FieldLineTracer.MIN_STEP
+            )
+            running[active[accepted & ~finite]] = False
+            # The change grows about linearly with the step.
+            with errstate(divide="ignore"):
+                scale = FieldLineTracer.SAFETY * self.tolerance / change
+            scale = minimum(
+                maximum(scale, FieldLineTracer.SHRINK), FieldLineTracer.GROWTH
+            )
+            steps[active] = minimum(
+                maximum(steps[active] * scale, FieldLineTracer.MIN_STEP),
+                FieldLineTracer.MAX_STEP,
+            )
+
+            moved = active[accepted & finite]
+            points[moved] = new[accepted & finite]
+            fields[moved] = end_field[accepted & finite]
+            previous[moved] = k1[accepted & finite]
+            lines.append(moved)
+            history.append(points[moved])
+
+            x, y = points[moved].T
+            outside = (x < 0) | (x >= w) | (y < 0) | (y >= h)
+            column, row = (
+                rint(points[moved] / FieldLineTracer.DISK_SPACING).astype(int64).T
+            )
+            arrived = zeros(len(moved), dtype=bool)
+            for line_sign, disks in ends.items():
+                candidates = ~outside & (directions[moved] == line_sign)
+                arrived[candidates] = disks[column[candidates], row[candidates]]
+            running[moved[outside | arrived]] = False
+            reached[moved[arrived]] = True
+
+        return self._get_polylines(
+            concatenate(lines),
+            concatenate(history),
+            len(points),
+            ~((directions < 0) & reached),
+        )
+
+    def _get_disks(self, positions: ndarray, size: tuple) -> ndarray:
+        """
+        Returns a boolean array, indexed by the point of a grid of spacing
+        DISK_SPACING nearest to each pixel, that is True on the points
+        closer than radius to any of positions.
+        """
+        w, h = size
+        spacing = FieldLineTracer.DISK_SPACING
+        shape = (w // spacing + 2, h // spacing + 2)
+        disks = SpatialHashMask(self.radius)
+        disks.build(shape, spacing, positions)
+        return disks.mask.reshape(shape)
+
+    @staticmethod
+    def _get_direction(field: ndarray) -> ndarray:
+        """Returns the unit vectors of field (0 where the field is 0)."""
+        norms = hypot(field[:, 0], field[:, 1])[:, None]
+        return divide(field, norms, out=zeros_like(field), where=norms > 0)
+
+    @staticmethod
+    def _get_polylines(
+        lines: ndarray, points: ndarray, count: int, kept: ndarray
+    ) -> list[ndarray]:
+        """
+        Groups the points recorded step by step (points[i] belongs to line
+        lines[i]) into one array per line, in order, leaving out the lines
+        that are not kept or have a single point.
+        """
+        order = argsort(lines, kind="stable")
+        sizes = bincount(lines, minlength=count)
+        polylines = split(points[order], cumsum(sizes)[:-1])
+        return [
+            polyline
+            for polyline, keep, size in zip(polylines, kept, sizes)
+            if keep and size > 1
+        ]
+
+
+class TracingJob(BackgroundJob):
+    def __init__(
+        self,
+        tracer: FieldLineTracer,
+        field_function: Callable,
+        positions: ndarray,
+        charges: ndarray,
+        size: tuple,
+        key,
+    ) -> None:
+        """
+        A TracingJob instance traces the field lines of the charges with
+        tracer on a background thread and publishes them as its only
+        result. field_function(positions, charges, points) returns the
+        field of the charges at points (see electripy.physics.solvers).
+
+        positions and charges are copied, so the charges the job was
+        started for may change while it runs. key identifies them, and a
+        job for charges that changed may be cancelled: it then stops at the
+        next step of the tracer and publishes nothing.
+        """
+        super().__init__(key)
+        positions = positions.copy()
+        charges = charges.copy()
+        self.tracer = tracer
+        self.size = size
+        self.positions = positions
+        self.charges = charges
+        self.field_function = lambda points: field_function(positions, charges, points)
+
+    def _work(self) -> None:
+        lines = self.tracer.trace(
+            self.positions,
+            self.charges,
+            self.field_function,
+            self.size,
+            self._cancelled,
+        )
+        if lines is not None:
+            self._publish(lines)
@@ -0,0 +1,61 @@
+from numpy import ndarray
+from electripy.physics.charge_distribution import ChargeDistribution
+from collections import OrderedDict
+
+
+class FieldProbe:
+    MAX_SIZE = 4096
+
+    def __init__(
+        self,
+        charge_distribution: ChargeDistribution,
+        fields: tuple = (),
+        exact: bool = False,
+        max_size: int = MAX_SIZE,
+    ) -> None:
+        """
+        A FieldProbe instance evaluates the electric field of
+        charge_distribution at single pixels, like the field vector drawn at
+        the mouse position.
+
+        Unless exact is True, the field is first interpolated from the
+        cached grid of the first of fields (Field instances, see
+        Field.interpolate) that covers the pixel. Otherwise it is computed
+        from every charge, and the result is kept in an LRU cache of the
+        last max_size pixels, so a pixel visited again (or a cursor that
+        stands still) costs a lookup. The cache is tagged with the
+        distribution and its version and emptied as soon as either changes.
+        """
+        self.charge_distribution = charge_distribution
+        self.fields = fields
+        self.exact = exact
+        self.max_size = max_size
+        self._cache = OrderedDict()
+        self._tag = None
+
+    def get_electric_field(self, x: int, y: int) -> ndarray:
+        """Returns the electric field at pixel (x, y)."""
+        key = (int(x), int(y))
+        tag = (self.charge_distribution, self.charge_distribution.version)
+        if self._tag != tag:
+            self._cache.clear()
+            self._tag = tag
+
+        field = self._cache.get(key)
+        if field is not None:
+            self._cache.move_to_end(key)
+            return field
+        if not self.exact:
+            for grid in self.fields:
+                field = grid.interpolate(key)
+                if field is not None:
+                    return field
+
+        field = self.charge_distribution.get_electric_field(key)
+        self._cache[key] = field
+        if len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+        return field
+
+    def __len__(self) -> int:
+        return len(self._cache)
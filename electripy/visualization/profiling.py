@@ -0,0 +1,148 @@
+from numpy import array, percentile
+from time import perf_counter
+from collections import deque
+from typing import Callable
+import cProfile
+import csv
+import json
+import os
+import pstats
+import tracemalloc
+
+
+class FrameTimer:
+    PHASES = ("events", "forces", "field", "rasterization", "charges", "display")
+    HISTORY = 600
+
+    def __init__(self, history: int = HISTORY) -> None:
+        """
+        A FrameTimer instance measures how long each phase of every frame
+        takes, and keeps the last history frames.
+
+        A phase is timed with `with timer.phase("field"):`. Phases may be
+        nested (adding a charge while handling events refreshes the screen)
+        and time is always charged to the innermost one, so the phases of a
+        frame never add up to more than the frame itself. Frames are
+        delimited with start_frame and end_frame.
+        """
+        self.history = history
+        self.frames = deque(maxlen=history)
+        self._phases = {name: _Phase(self, name) for name in FrameTimer.PHASES}
+        self._current = dict.fromkeys(FrameTimer.PHASES, 0.0)
+        self._stack = []
+        self._frame_start = None
+
+    def phase(self, name: str) -> "_Phase":
+        return self._phases[name]
+
+    def start_frame(self) -> None:
+        self._frame_start = perf_counter()
+
+    def end_frame(self) -> None:
+        """Stores the times of the current frame and starts a new one."""
+        if self._frame_start is None:
+            return
+        frame = dict(self._current)
+        frame["total"] = perf_counter() - self._frame_start
+        self.frames.append(frame)
+        self._current = dict.fromkeys(FrameTimer.PHASES, 0.0)
+        self._frame_start = None
+
+    def _enter(self, name: str) -> None:
+        now = perf_counter()
+        if self._stack:
+            outer, start = self._stack[-1]
+            self._current[outer] += now - start
+        self._stack.append((name, now))
+
+    def _exit(self) -> None:
+        now = perf_counter()
+        name, start = self._stack.pop()
+        self._current[name] += now - start
+        if self._stack:
+            self._stack[-1] = (self._stack[-1][0], now)
+
+    def percentile(self, name: str, q: float) -> float:
+        """
+        Returns the q-th percentile (0 to 100) of phase name (or "total")
+        over the frames kept, in seconds.
+        """
+        if not self.frames:
+            return 0.0
+        return float(percentile([frame[name] for frame in self.frames], q))
+
+    def percentiles(self, qs: tuple = (50, 95, 99)) -> dict[str, dict[float, float]]:
+        """
+        Returns {phase: {q: seconds}} for every phase and the frame total.
+        """
+        names = FrameTimer.PHASES + ("total",)
+        if not self.frames:
+            return {name: dict.fromkeys(qs, 0.0) for name in names}
+        times = array([[frame[name] for name in names] for frame in self.frames])
+        values = percentile(times, qs, axis=0)
+        return {
+            name: {q: float(values[i, j]) for i, q in enumerate(qs)}
+            for j, name in enumerate(names)
+        }
+
+    def to_csv(self, path: str) -> None:
+        """Writes one row per frame with the time of each phase in seconds."""
+        fields = ("frame",) + FrameTimer.PHASES + ("total",)
+        with open(path, "w", newline="") as file:
+            writer = csv.DictWriter(file, fields)
+            writer.writeheader()
+            for index, frame in enumerate(self.frames):
+                writer.writerow({"frame": index, **frame})
+
+    def to_json(self, path: str) -> None:
+        """Writes the frames and their percentiles as JSON."""
+        with open(path, "w") as file:
+            json.dump(
+                {
+                    "phases": list(FrameTimer.PHASES),
+                    "percentiles": self.percentiles(),
+                    "frames": list(self.frames),
+                },
+                file,
+                indent=2,
+            )
+
+
+class _Phase:
+    def __init__(self, timer: FrameTimer, name: str) -> None:
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.timer._enter(self.name)
+
+    def __exit__(self, *args) -> None:
+        self.timer._exit()
+
+
+def profile_session(function: Callable, directory: str) -> None:
+    """
+    Runs function with cProfile and tracemalloc on and writes to directory:
+
+        profile.prof: cProfile stats, to be read with pstats or snakeviz
+        profile.txt: the functions with the greatest cumulative time
+        memory.txt: peak traced memory and the lines that allocated the most
+    """
+    os.makedirs(directory, exist_ok=True)
+    profiler = cProfile.Profile()
+    tracemalloc.start()
+    try:
+        profiler.runcall(function)
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        profiler.dump_stats(os.path.join(directory, "profile.prof"))
+        with open(os.path.join(directory, "profile.txt"), "w") as file:
+            stats = pstats.Stats(profiler, stream=file)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(40)
+        with open(os.path.join(directory, "memory.txt"), "w") as file:
+            file.write(f"peak traced memory: {peak / 2**20:.2f} MiB\n\n")
+            for stat in snapshot.statistics("lineno")[:30]:
+                file.write(f"{stat}\n")
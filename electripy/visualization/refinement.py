@@ -0,0 +1,46 @@
+from numpy import ndarray, concatenate
+from electripy.visualization.background import BackgroundJob
+from typing import Callable
+
+
+class RefinementJob(BackgroundJob):
+    TILE_SIZE = 8192
+
+    def __init__(self, field_function: Callable, levels: list, key) -> None:
+        """
+        A RefinementJob instance evaluates field_function on a background
+        thread at several levels of detail, coarsest first. levels is a
+        list of (spacing, points) pairs, points being the (M, 2) grid of
+        that spacing, and key identifies the grid the job refines.
+
+        A level is only published, as a (spacing, points, vectors) tuple,
+        once all of its points are computed, so whoever collects it swaps a
+        complete grid in. The points are evaluated in tiles of TILE_SIZE and
+        a cancelled job stops at the next tile. field_function may read
+        charges that change while the job runs: such a job must be
+        cancelled and its results dropped.
+        """
+        super().__init__(key)
+        self.field_function = field_function
+        self.levels = levels
+
+    def _work(self) -> None:
+        for spacing, points in self.levels:
+            vectors = self._evaluate(points)
+            if vectors is None:
+                return
+            self._publish((spacing, points, vectors))
+
+    def _evaluate(self, points: ndarray) -> ndarray:
+        """
+        Returns the field at points, or None if the job was cancelled
+        before all of them were computed.
+        """
+        tiles = []
+        for start in range(0, max(len(points), 1), RefinementJob.TILE_SIZE):
+            if self._cancelled.is_set():
+                return None
+            tiles.append(
+                self.field_function(points[start : start + RefinementJob.TILE_SIZE])
+            )
+        return concatenate(tiles) if len(tiles) > 1 else tiles[0]
@@ -0,0 +1,137 @@
+from importlib import resources
+import pygame
+import pygame.sysfont
+import json
+import os
+
+
+SOUNDS = resources.files("electripy.visualization") / "sounds"
+FONT_CACHE_FILE = "fonts.json"
+
+
+def get_cache_directory() -> str:
+    """
+    Returns the directory where electripy keeps its caches:
+    $XDG_CACHE_HOME/electripy, or ~/.cache/electripy if it is not set.
+    """
+    root = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(root, "electripy")
+
+
+class LazySound:
+    def __init__(self, name: str) -> None:
+        """
+        A LazySound instance plays the file name of the sounds directory.
+        The file is read, and the mixer initialized, the first time the
+        sound is loaded or played, so starting the simulation does not wait
+        for the audio device. Without an audio device the sound is disabled.
+        """
+        self.name = name
+        self._sound = None
+        self._available = True
+
+    def load(self) -> bool:
+        """Loads the sound if it was not loaded. Returns if it can be played."""
+        if self._sound is None and self._available:
+            try:
+                if not pygame.mixer.get_init():
+                    pygame.mixer.init()
+                with (SOUNDS / self.name).open("rb") as file:
+                    self._sound = pygame.mixer.Sound(file=file)
+            except pygame.error:
+                self._available = False
+        return self._sound is not None
+
+    def play(self) -> None:
+        if self.load():
+            self._sound.play()
+
+
+class FontCache:
+    def __init__(self, path: str = None) -> None:
+        """
+        A FontCache instance creates system fonts like pygame.font.SysFont
+        does, without scanning the installed fonts every time the simulation
+        starts (SysFont runs fc-list, or reads the registry, on its first
+        call).
+
+        The file each (name, bold, italic) font resolves to, and whether
+        bold and italic have to be emulated, are stored as JSON in path
+        (FONT_CACHE_FILE in the cache directory by default). A cached file
+        that no longer exists is resolved again. Fonts are also kept in
+        memory, so asking twice for the same font returns the same object.
+        """
+        self.path = path or os.path.join(get_cache_directory(), FONT_CACHE_FILE)
+        self._entries = None
+        self._fonts = {}
+
+    def get_font(
+        self, name: str, size: int, bold: bool = False, italic: bool = False
+    ) -> pygame.font.Font:
+        key = (name, size, bold, italic)
+        if key not in self._fonts:
+            font_path, set_bold, set_italic = self._resolve(name, bold, italic)
+            self._fonts[key] = pygame.sysfont.font_constructor(
+                font_path, size, set_bold, set_italic
+            )
+        return self._fonts[key]
+
+    def _resolve(self, name: str, bold: bool, italic: bool) -> tuple:
+        """
+        Returns the font file (None for pygame's default font) and whether
+        bold and italic are emulated, from the cache if possible.
+        """
+        entries = self._load()
+        key = f"{name}|{int(bold)}|{int(italic)}"
+        entry = entries.get(key)
+        if entry is not None and (entry[0] is None or os.path.exists(entry[0])):
+            return tuple(entry)
+
+        resolved = []
+
+        def constructor(font_path, size, set_bold, set_italic):
+            resolved.extend((font_path, set_bold, set_italic))
+            return None
+
+        pygame.font.SysFont(name, 1, bold, italic, constructor)
+        entries[key] = resolved
+        self._save()
+        return tuple(resolved)
+
+    def _load(self) -> dict:
+        if self._entries is None:
+            try:
+                with open(self.path) as file:
+                    self._entries = json.load(file)
+            except (OSError, ValueError):
+                self._entries = {}
+            if not isinstance(self._entries, dict):
+                self._entries = {}
+        return self._entries
+
+    def _save(self) -> None:
+        """
+        Writes the cache, replacing the file at once so that a simulation
+        starting at the same time never reads half of it. A cache that
+        cannot be written is only kept in memory.
+        """
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(temporary, "w") as file:
+                json.dump(self._entries, file, indent=2)
+            os.replace(temporary, self.path)
+        except OSError:
+            pass
+
+
+FONTS = FontCache()
+
+
+def get_font(
+    name: str, size: int, bold: bool = False, italic: bool = False
+) -> pygame.font.Font:
+    """Returns the system font name of size, like pygame.font.SysFont."""
+    return FONTS.get_font(name, size, bold, italic)
@@ -1,18 +1,42 @@
-from numpy import array, ndarray
+from numpy import (
+    array,
+    ndarray,
+    arange,
+    meshgrid,
+    column_stack,
+    zeros,
+    empty,
+    maximum,
+    isfinite,
+    finfo,
+    float32,
+    linspace,
+    clip,
+    rint,
+    uint8,
+    int64,
+    log10,
+    percentile,
+)
 from numpy.linalg import norm
-from math import acos, cos, sin, pi, sqrt
+from math import acos, cos, sin, pi, hypot, ceil, floor
 import pygame
 from typing import Callable, Union
 from electripy.physics.charges import Proton, Electron
 from electripy.physics.charge_distribution import ChargeDistribution
+from electripy.physics.solvers import get_solver
+from electripy.physics.backends import AutoBackend, get_backend
+from electripy.physics import scenes
 from electripy.visualization import colors, settings, numbers
+from electripy.visualization.sprites import ArrowAtlas, ChargeSprite, LabelCache
+from electripy.visualization.spatial_hash import SpatialHashMask
+from electripy.visualization.profiling import FrameTimer
+from electripy.visualization.refinement import RefinementJob
+from electripy.visualization.adaptive import QuadtreeSampler, get_variation
+from electripy.visualization.resources import LazySound, get_font
+from electripy.visualization.probe import FieldProbe
+from electripy.visualization.field_lines import FieldLineTracer, TracingJob
 from collections import deque
-import pkg_resources
-
-
-SOUND_PATH = pkg_resources.resource_filename(
-    "electripy.visualization", "sounds/add_charge.wav"
-)
 
 
 class Screen:
@@ -37,9 +61,22 @@ class Screen:
         self._electric_field_copy = None
         self._last_cursor_position = (0, 0)
         self._last_screen_size = self._window.get_size()
+        self._scene = None
+        self._overlay_rects = []
+        self._dirty_rects = None
+        self._pending_refresh = None
 
         # Charge distribution and Vector setup
-        self.charge_distribution = ChargeDistribution()
+        # Size buckets are calibrated in the background, so no frame waits
+        # for the numba kernels to compile.
+        self.backend = get_backend(dtype=settings.PRECISION, background=True)
+        solver_options = dict(settings.SOLVER_OPTIONS)
+        if settings.SOLVER == "direct":
+            solver_options.setdefault("backend", self.backend)
+        elif settings.SOLVER == "parallel":
+            solver_options.setdefault("dtype", settings.PRECISION)
+        self.solver = get_solver(settings.SOLVER, **solver_options)
+        self.charge_distribution = ChargeDistribution(self.solver, self.backend)
         self.force_vector = Vector(
             self._window,
             settings.DEFAULT_FORCE_VECTOR_SCALE_FACTOR,
@@ -53,11 +90,42 @@ class Screen:
             settings.DEFAULT_EF_VECTOR_SCALE_FACTOR,
             settings.MINIMUM_ELECTRIC_FIELD_VECTOR_NORM,
         )
-        self.electric_field = Field(
+        if settings.ADAPTIVE_FIELD_SAMPLING:
+            self.electric_field = AdaptiveField(
+                self._window,
+                settings.DEFAULT_EF_BRIGHTNESS,
+                self.charge_distribution.get_electric_field_batch,
+                settings.DEFAULT_SPACE_BETWEEN_EF_VECTORS,
+                self.charge_distribution.backend,
+            )
+        else:
+            self.electric_field = Field(
+                self._window,
+                settings.DEFAULT_EF_BRIGHTNESS,
+                self.charge_distribution.get_electric_field_batch,
+                settings.DEFAULT_SPACE_BETWEEN_EF_VECTORS,
+                self.charge_distribution.backend,
+                settings.FIELD_REFINEMENT_LEVELS,
+            )
+        self.electric_field_heatmap = Heatmap(
             self._window,
             settings.DEFAULT_EF_BRIGHTNESS,
-            self.charge_distribution.get_electric_field,
-            settings.DEFAULT_SPACE_BETWEEN_EF_VECTORS,
+            self.charge_distribution.get_electric_field_batch,
+            settings.HEATMAP_PIXEL_STEP,
+            self.charge_distribution.backend,
+            settings.FIELD_REFINEMENT_LEVELS,
+        )
+        self.field_lines = FieldLines(
+            self._window,
+            settings.DEFAULT_EF_BRIGHTNESS,
+            self.charge_distribution,
+            FieldLineTracer(settings.FIELD_LINES_PER_CHARGE, settings.MAX_FIELD_LINES),
+        )
+        # The heatmap grid is the finest one, so it is tried first.
+        self.field_probe = FieldProbe(
+            self.charge_distribution,
+            (self.electric_field_heatmap, self.electric_field),
+            settings.EXACT_FIELD_PROBE,
         )
 
         # State attributes
@@ -65,33 +133,122 @@ class Screen:
         self.showing_electric_forces_vectors = False
         self.showing_electric_field_at_mouse_position = False
         self.showing_electric_field = True
+        self.showing_electric_field_heatmap = False
+        self.showing_field_lines = False
+        self.showing_frame_times = False
+
+        # Frame times
+        self.frame_timer = FrameTimer()
 
         # Sounds setup
-        self.add_charge_sound = pygame.mixer.Sound(SOUND_PATH)
+        self.add_charge_sound = LazySound("add_charge.wav")
 
         # Text settings
         pygame.font.init()
-        self.vector_components_font = pygame.font.SysFont(
+        self.vector_components_font = get_font(
             settings.VECTOR_COMPONENTS_FONT, settings.VECTOR_COMPONENTS_FONT_SIZE
         )
         self.vector_components_font_color = colors.WHITE
-        self.proton_text_surface = pygame.font.SysFont(
+        self.vector_components_labels = LabelCache(
+            self.vector_components_font, self.vector_components_font_color
+        )
+        self.frame_times_font = get_font(
+            settings.FRAME_TIMES_FONT, settings.FRAME_TIMES_FONT_SIZE
+        )
+        self.proton_text_surface = get_font(
             settings.CHARGES_SIGN_FONT, settings.PROTON_SIGN_FONT_SIZE, bold=True
         ).render("+", False, colors.BLACK)
 
-        self.electron_text_surface = pygame.font.SysFont(
+        self.electron_text_surface = get_font(
             settings.CHARGES_SIGN_FONT, settings.ELECTRON_SIGN_FONT_SIZE, bold=False
         ).render("-", False, colors.BLACK)
 
+        # Charge sprites
+        self.proton_sprite = ChargeSprite(
+            AnimatedProton.COLOR, AnimatedProton.RADIUS, self.proton_text_surface, 1
+        )
+        self.electron_sprite = ChargeSprite(
+            AnimatedElectron.COLOR,
+            AnimatedElectron.RADIUS,
+            self.electron_text_surface,
+            2,
+        )
+
+    def load_sounds(self) -> None:
+        """
+        Loads the sounds, initializing the mixer. The simulation calls it
+        once the first frame is on screen, so that neither the startup nor
+        the first charge added waits for the audio device.
+        """
+        self.add_charge_sound.load()
+
+    def start_calibration(self) -> None:
+        """
+        Lets the backend calibrate its size buckets in the background. The
+        simulation calls it once the first frame is on screen, like
+        load_sounds, since it imports the numba backend.
+        """
+        AutoBackend.start_background_calibration()
+
     def clean(self) -> None:
         """Fills the screen with it's background color."""
         self._window.fill(self.background_color)
 
     def clear(self) -> None:
         """Restarts charge distribution."""
+        self.set_charge_distribution(ChargeDistribution(self.solver, self.backend))
+
+    def save_scene(self, path: str) -> None:
+        """Writes the charges on screen to the scene file path."""
+        scenes.save_scene(self.charge_distribution, path)
+
+    def load_scene(self, path: str) -> None:
+        """Replaces the charges on screen with the ones of the scene file path."""
+        self.set_charge_distribution(scenes.load_scene(path, self.solver, self.backend))
+
+    def set_charge_distribution(self, charge_distribution: ChargeDistribution) -> None:
+        """Replaces the charges on screen with the ones of charge_distribution."""
         self.clear_electric_field_copy()
-        self.charge_distribution = ChargeDistribution()
+        self.charge_distribution = charge_distribution
+        self.field_probe.charge_distribution = self.charge_distribution
+        self.field_lines.charge_distribution = self.charge_distribution
+        for field in self._fields():
+            field.field_function = self.charge_distribution.get_electric_field_batch
+            field.backend = self.charge_distribution.backend
+            field.invalidate()
         self.clean()
+        self.request_refresh()
+
+    def _fields(self) -> tuple:
+        """Returns every field representation kept in sync with the charges."""
+        return self.electric_field, self.electric_field_heatmap
+
+    def _shown_fields(self) -> list:
+        fields = []
+        if self.showing_electric_field:
+            fields.append(self.electric_field)
+        if self.showing_electric_field_heatmap:
+            fields.append(self.electric_field_heatmap)
+        return fields
+
+    def update_fields(self) -> None:
+        """
+        Swaps in the field refinement levels and the field lines finished in
+        the background since the last call, and requests a refresh if there
+        was any.
+        """
+        changed = [field.collect_refinement() for field in self._shown_fields()]
+        if self.showing_field_lines:
+            changed.append(self.field_lines.collect())
+        if any(changed):
+            self.clear_electric_field_copy()
+            self.request_refresh()
+
+    def is_refining_fields(self) -> bool:
+        """Tells if a shown field is still being computed in the background."""
+        if self.showing_field_lines and self.field_lines.is_tracing():
+            return True
+        return any(field.is_refining() for field in self._shown_fields())
 
     def add_charge(
         self, charge: Union[Proton, Electron], clean_charges_removed: bool
@@ -99,9 +256,11 @@ class Screen:
         """Adds a charge to the screen and to the charge distribution."""
         self.add_charge_sound.play()
         self.charge_distribution.add_charge(charge)
-        self.electric_field.field_function = self.charge_distribution.get_electric_field
+        with self.frame_timer.phase("field"):
+            for field in self._fields():
+                field.add_source(charge.position, charge.charge)
         self.clear_electric_field_copy()
-        self.refresh_screen()
+        self.request_refresh()
         if clean_charges_removed:
             self.charges_removed = deque()
 
@@ -116,16 +275,21 @@ class Screen:
             return
         charge = self.charge_distribution[-1]
         self.charge_distribution.remove_charge(charge)
-        self.electric_field.field_function = self.charge_distribution.get_electric_field
+        with self.frame_timer.phase("field"):
+            for field in self._fields():
+                field.remove_source(charge.position, charge.charge)
         self.charges_removed.append(charge)
         self.clear_electric_field_copy()
-        self.refresh_screen()
+        self.request_refresh()
 
-    def show_electric_field_vector(self, x: int, y: int) -> None:
-        """Shows the electric field vector at the given position."""
+    def show_electric_field_vector(self, x: int, y: int) -> list[pygame.Rect]:
+        """
+        Shows the electric field vector at the given position and returns
+        the rects drawn.
+        """
         position = array([x, y])
-        ef = self.charge_distribution.get_electric_field(position)
-        self._draw_vector(
+        ef = self.field_probe.get_electric_field(x, y)
+        return self._draw_vector(
             self.ef_vector,
             position,
             ef,
@@ -141,7 +305,7 @@ class Screen:
         """
         self.force_vector.scale_factor *= Vector.DELTA_SCALE_FACTOR
         self.ef_vector.scale_factor *= Vector.DELTA_SCALE_FACTOR
-        self.refresh_screen()
+        self.request_refresh()
 
     def decrement_scale_factor(self) -> None:
         """
@@ -150,16 +314,20 @@ class Screen:
         """
         self.force_vector.scale_factor /= Vector.DELTA_SCALE_FACTOR
         self.ef_vector.scale_factor /= Vector.DELTA_SCALE_FACTOR
-        self.refresh_screen()
+        self.request_refresh()
 
     def increment_electric_field_brightness(self) -> None:
         if self.electric_field.brightness < Field.MAX_BRIGHTNESS:
             self.electric_field.brightness += Field.BRIGHTNESS_VARIATION
+            self.electric_field_heatmap.brightness = self.electric_field.brightness
+            self.field_lines.brightness = self.electric_field.brightness
         self.clear_electric_field_copy()
 
     def decrement_electric_field_brightness(self) -> None:
         if self.electric_field.brightness > Field.MIN_BRIGHTNESS:
             self.electric_field.brightness -= Field.BRIGHTNESS_VARIATION
+            self.electric_field_heatmap.brightness = self.electric_field.brightness
+            self.field_lines.brightness = self.electric_field.brightness
         self.clear_electric_field_copy()
 
     def _draw_vector(
@@ -170,90 +338,195 @@ class Screen:
         radius: int,
         color: tuple,
         show_components: bool,
-    ) -> None:
-        vector.draw(position, array, radius, color)
+    ) -> list[pygame.Rect]:
+        rects = [vector.draw(position, array, radius, color)]
         if show_components:
-            self._display_arrays_components(list(vector.last_end_point), array)
+            rects += self._display_arrays_components(list(vector.last_end_point), array)
+        return rects
 
-    def _display_arrays_components(self, position: list, array: ndarray):
+    def _display_arrays_components(
+        self, position: list, array: ndarray
+    ) -> list[pygame.Rect]:
         """Displays the arrays components next to the vector drawn."""
         x, y = numbers.array_to_string(array)
-        x_text = self.vector_components_font.render(
-            x, True, self.vector_components_font_color
-        )
-        y_text = self.vector_components_font.render(
-            y, True, self.vector_components_font_color
-        )
-        self._window.blit(x_text, position)
+        x_text = self.vector_components_labels.render(x)
+        y_text = self.vector_components_labels.render(y)
+        x_rect = self._window.blit(x_text, position)
         position[1] += 15
-        self._window.blit(y_text, position)
+        y_rect = self._window.blit(y_text, position)
+        return [x_rect, y_rect]
 
     def refresh_screen(self, mx: int = None, my: int = None) -> None:
         """
-        Cleans the screen, get electric forces and calls _draw_charge
-        for each charge on screen.
+        Cleans the screen, draws the electric field (its vectors, heatmap
+        and lines), the charges and their
+        electric forces, and then the overlays (the electric field vector at
+        the mouse position and the frame times).
+
+        The screen without the overlays is kept as the scene, so that
+        refresh_overlays can move them without drawing everything again.
+        The whole window is updated by the next update_display.
         """
         self.clean()
 
-        if self.showing_electric_field:
+        if (
+            self.showing_electric_field
+            or self.showing_electric_field_heatmap
+            or self.showing_field_lines
+        ):
             if not self._electric_field_copy:
                 self.show_electric_field()
             else:
-                self._window.blit(self._electric_field_copy, (0, 0))
+                with self.frame_timer.phase("rasterization"):
+                    self._window.blit(self._electric_field_copy, (0, 0))
 
-        electric_forces = self.charge_distribution.get_electric_forces()
-        for ef in electric_forces:
-            charge = ef[0]
-            force = ef[1]
-            self._draw_charge(charge, force)
+        with self.frame_timer.phase("charges"):
+            self._draw_charges()
 
+        if self.showing_electric_field_at_mouse_position or self.showing_frame_times:
+            self._scene = self._window.copy()
+        else:
+            self._scene = None
+        self._overlay_rects = self._draw_overlays(mx, my)
+        self._dirty_rects = None
+
+    def request_refresh(self, overlays_only: bool = False) -> None:
+        """
+        Asks for the screen (or only its overlays) to be drawn again by the
+        next call to render. Several requests made while handling the events
+        of a frame result in a single redraw.
+        """
+        if overlays_only and self._pending_refresh is None:
+            self._pending_refresh = "overlays"
+        elif not overlays_only:
+            self._pending_refresh = "full"
+
+    def has_pending_refresh(self) -> bool:
+        return self._pending_refresh is not None
+
+    def render(self, mx: int = None, my: int = None) -> None:
+        """Performs the refresh requested since the last render, if any."""
+        if self._pending_refresh == "full":
+            self.refresh_screen(mx, my)
+        elif self._pending_refresh == "overlays":
+            self.refresh_overlays(mx, my)
+        self._pending_refresh = None
+
+    def refresh_overlays(self, mx: int = None, my: int = None) -> None:
+        """
+        Redraws only the overlays: the rects they covered are restored from
+        the scene and they are drawn again at the new mouse position. Only
+        the old and new rects are updated by the next update_display, so the
+        cost does not depend on the number of charges or field vectors.
+        """
+        if self._scene is None:
+            self.refresh_screen(mx, my)
+            return
+        with self.frame_timer.phase("rasterization"):
+            old_rects = self._overlay_rects
+            for rect in old_rects:
+                self._window.blit(self._scene, rect, rect)
+            self._overlay_rects = self._draw_overlays(mx, my)
+        if self._dirty_rects is not None:
+            self._dirty_rects += old_rects + self._overlay_rects
+
+    def update_display(self) -> None:
+        """
+        Updates the parts of the display that changed since the last call:
+        the whole window after refresh_screen, or just the dirty rects of
+        refresh_overlays.
+        """
+        if self._dirty_rects is None:
+            pygame.display.update()
+        elif self._dirty_rects:
+            pygame.display.update(self._dirty_rects)
+        self._dirty_rects = []
+
+    def _draw_overlays(self, mx: int = None, my: int = None) -> list[pygame.Rect]:
+        rects = []
         if self.showing_electric_field_at_mouse_position:
             if mx is None or my is None:
                 mx, my = self._last_cursor_position
-            self.show_electric_field_vector(mx, my)
+            rects += self.show_electric_field_vector(mx, my)
 
         if mx is not None or my is not None:
             self._last_cursor_position = (mx, my)
 
-    def _draw_charge(self, charge: Union[Proton, Electron], force: ndarray) -> None:
-        """Draws a charge and its force vector."""
-        if isinstance(charge, Proton):
-            color = AnimatedProton.COLOR
-            radius = AnimatedProton.RADIUS
-            charge_text_surface = self.proton_text_surface
-            y_sign_displacement = 1
-
-        if isinstance(charge, Electron):
-            color = AnimatedElectron.COLOR
-            radius = AnimatedElectron.RADIUS
-            charge_text_surface = self.electron_text_surface
-            y_sign_displacement = 2
+        if self.showing_frame_times:
+            rects += self._draw_frame_times()
+        return rects
 
-        pygame.draw.circle(self._window, color, charge.position, radius)
+    def _draw_frame_times(self) -> list[pygame.Rect]:
+        """
+        Draws the 50th and 95th percentiles of each phase of the last
+        frames, in milliseconds, in the top left corner.
+        """
+        percentiles = self.frame_timer.percentiles((50, 95))
+        lines = [f"{'phase':<14}{'p50':>8}{'p95':>8}"] + [
+            f"{name:<14}{times[50] * 1000:>8.2f}{times[95] * 1000:>8.2f}"
+            for name, times in percentiles.items()
+        ]
+        height = self.frame_times_font.get_linesize()
+        rects = []
+        for index, line in enumerate(lines):
+            text = self.frame_times_font.render(
+                line, True, self.vector_components_font_color, colors.BLACK
+            )
+            rects.append(self._window.blit(text, (5, 5 + index * height)))
+        return rects
 
-        # Draw charge sign:
-        sign_position = (
-            charge.position[0] - charge_text_surface.get_width() // 2,
-            charge.position[1] - charge_text_surface.get_width() * y_sign_displacement,
+    def _draw_charges(self) -> None:
+        """
+        Draws every charge with a single blits call using the pre-rendered
+        charge sprites, and then their force vectors if they are shown.
+        """
+        positions = self.charge_distribution.positions
+        is_positive = (self.charge_distribution.charges > 0).tolist()
+        sprites = {True: self.proton_sprite, False: self.electron_sprite}
+        self._window.blits(
+            [
+                (
+                    sprites[positive].surface,
+                    (
+                        x + sprites[positive].offset[0],
+                        y + sprites[positive].offset[1],
+                    ),
+                )
+                for (x, y), positive in zip(positions.tolist(), is_positive)
+            ],
+            doreturn=False,
         )
-        self._window.blit(charge_text_surface, sign_position)
 
         if len(self.charge_distribution) > 1 and self.showing_electric_forces_vectors:
-            self._draw_vector(
-                self.force_vector,
-                charge.position,
-                force,
-                radius,
-                colors.YELLOW,
-                self.showing_vectors_components,
-            )
+            with self.frame_timer.phase("forces"):
+                forces = self.charge_distribution.get_electric_forces_array()
+            for position, force, positive in zip(positions, forces, is_positive):
+                radius = AnimatedProton.RADIUS if positive else AnimatedElectron.RADIUS
+                self._draw_vector(
+                    self.force_vector,
+                    position,
+                    force,
+                    radius,
+                    colors.YELLOW,
+                    self.showing_vectors_components,
+                )
 
     def show_electric_field(self) -> None:
-        restricted_points = [
-            charge.position for charge in self.charge_distribution.charges_set.charges
-        ]
-        self.electric_field.draw(restricted_points)
-        self._electric_field_copy = self._window.copy()
+        with self.frame_timer.phase("field"):
+            if self.showing_electric_field_heatmap:
+                self.electric_field_heatmap.get_grid_field()
+            if self.showing_electric_field:
+                self.electric_field._get_field(self.charge_distribution.positions)
+            if self.showing_field_lines:
+                self.field_lines.trace()
+        with self.frame_timer.phase("rasterization"):
+            if self.showing_electric_field_heatmap:
+                self.electric_field_heatmap.draw()
+            if self.showing_electric_field:
+                self.electric_field.draw(self.charge_distribution.positions)
+            if self.showing_field_lines:
+                self.field_lines.draw()
+            self._electric_field_copy = self._window.copy()
 
     def clear_electric_field_copy(self):
         self._electric_field_copy = None
@@ -269,6 +542,10 @@ class Field:
     BRIGHTNESS_VARIATION = 25
     MAX_BRIGHTNESS = 205
     MIN_BRIGHTNESS = 50
+    DRIFT_TOLERANCE = 1e-9
+    SINGLE_PRECISION_DRIFT_TOLERANCE = 1e-4
+    REFINEMENT_WAIT = 0.02
+    INTERPOLATION_TOLERANCE = 0.02
 
     def __init__(
         self,
@@ -276,58 +553,579 @@ class Field:
         brightness: int,
         field_function: Callable,
         space_between_vectors: int,
+        backend=None,
+        refinement_levels: tuple = None,
     ) -> None:
         """
-        field_function must be a function that given a 2-dimensional vector
-        returns another 2-dimensional vector.
+        field_function must be a function that given an (M, 2) array of
+        points returns an (M, 2) array with the field vector at each point.
         space_between_vectors is the amount of pixels between each vector. The
         shorter space_between_vectors is the more accurate the field will be.
+        backend (see electripy.physics.backends) computes the field of the
+        charges added or removed with add_source and remove_source.
+
+        refinement_levels, multiples of space_between_vectors such as
+        (4, 2, 1), makes the grid be computed in the background, from the
+        coarsest level to the finest. Each level replaces the previous one
+        when it is finished (see collect_refinement). By default the grid is
+        computed at once by the caller of get_grid_field.
         """
         self._window = window
         self.brightness = brightness
         self.vector_painter = ColoredVector(window)
+        self.color_map = colors.RedBlueColorGenerator
         self.field_function = field_function
         self.space_between_vectors = space_between_vectors
+        self.backend = backend if backend is not None else get_backend()
+        self.refinement_levels = refinement_levels
+
+        # Raw field cache
+        self._grid_points = None
+        self._grid_vectors = None
+        self._grid_drift = None
+        self._grid_key = None
+        self._grid_spacing = space_between_vectors
+        self._grid_version = 0
+        self._refinement = None
+
+        # Restricted points mask
+        self._restricted_mask = SpatialHashMask(AnimatedProton.RADIUS * 2)
+        self._mask_version = 0
+
+        # Render cache
+        self._render_version = None
+        self._positions = None
+        self._vectors = None
+        self._norms = None
+        self._greatest_norm = 0.0
+        self._atlas = None
+        self._atlas_key = None
+
+    def _get_grid_points(self, spacing: int = None) -> ndarray:
+        """
+        Returns an (M, 2) array with the position of every vector of the
+        field, column by column. spacing defaults to space_between_vectors.
+        """
+        spacing = spacing or self.space_between_vectors
+        columns, rows = self._get_grid_shape(spacing)
+        xs = arange(columns) * spacing
+        ys = arange(rows) * spacing
+        grid_x, grid_y = meshgrid(xs, ys, indexing="ij")
+        return column_stack((grid_x.ravel(), grid_y.ravel())).astype(float)
+
+    def _get_grid_shape(self, spacing: int = None) -> tuple[int, int]:
+        """Returns the number of columns and rows of the grid."""
+        spacing = spacing or self.space_between_vectors
+        w, h = self._window.get_size()
+        return ceil(w / spacing), ceil(h / spacing)
 
-    def _is_in_restricted_point(
-        self, position: ndarray, restricted_points: list[ndarray]
-    ) -> bool:
-        for point in restricted_points:
-            if norm(position - point) <= AnimatedProton.RADIUS * 2:
-                return True
-        return False
+    def _get_field(self, restricted_points: ndarray) -> tuple[ndarray, ndarray]:
+        """
+        Returns the positions of the field vectors and the vectors themselves
+        as two (M, 2) arrays, leaving out the restricted points.
+        """
+        self._update_render_cache(restricted_points)
+        return self._positions, self._vectors
 
-    def _get_field(self, restricted_points: list[ndarray]) -> list[dict]:
-        field = []
-        w, h = self._window.get_size()
-        for x in range(0, w, self.space_between_vectors):
-            for y in range(0, h, self.space_between_vectors):
-                if self._is_in_restricted_point(array((x, y)), restricted_points):
-                    continue
-                field.append(
-                    {"position": (x, y), "vector": (self.field_function((x, y)))}
-                )
-        return field
+    def _update_render_cache(self, restricted_points: ndarray) -> None:
+        """
+        Computes the vectors to draw, their norms and the greatest norm
+        from the raw field. They are only computed again when the raw field
+        or the restricted points mask change, so changing the brightness,
+        the color map or the arrows scale just draws the cached arrays again.
 
-    @staticmethod
-    def get_sorted_field_vectors(field: list[dict]) -> list[dict]:
-        field_vectors = [d["vector"] for d in field]
-        return sorted(field_vectors, reverse=True, key=norm)
+        restricted_points are only read when the mask has to be built from
+        scratch: add_source and remove_source keep it up to date otherwise.
+        """
+        points, vectors = self.get_grid_field()
+        if points is None:
+            self._positions = self._vectors = empty((0, 2))
+            self._norms = empty(0)
+            self._greatest_norm = 0.0
+            self._render_version = None
+            return
+        mask_key = (self._get_grid_shape(self._grid_spacing), self._grid_spacing)
+        if self._restricted_mask.key != mask_key:
+            self._restricted_mask.build(*mask_key, restricted_points)
+            self._mask_version += 1
+
+        version = (self._grid_version, self._mask_version)
+        if self._render_version == version:
+            return
+        drawn = ~self._restricted_mask.mask
+        self._positions = points[drawn]
+        self._vectors = vectors[drawn]
+        self._norms = norm(self._vectors, axis=1)
+        self._greatest_norm = self._norms.max() if len(self._norms) else 0.0
+        self._render_version = version
+
+    def get_grid_field(self) -> tuple[ndarray, ndarray]:
+        """
+        Returns the grid points and the field vector at each of them.
+
+        The vectors are cached and kept up to date by add_source and
+        remove_source. The whole grid is only evaluated again (with a single
+        call to field_function) after the window is resized, the space
+        between vectors changes, the cache is invalidated or the accumulated
+        floating point drift exceeds DRIFT_TOLERANCE.
+
+        With refinement_levels the grid is evaluated in the background
+        instead, and this returns the finest level finished so far, which
+        may be coarser than space_between_vectors, or (None, None) if there
+        is none yet.
+        """
+        key = (self._window.get_size(), self.space_between_vectors)
+        if self._grid_key != key:
+            if self.refinement_levels:
+                self._refine(key)
+            else:
+                self._set_grid(key, self._get_grid_points(), None)
+        return self._grid_points, self._grid_vectors
+
+    def _set_grid(self, key: tuple, points: ndarray, vectors: ndarray) -> None:
+        """
+        Replaces the cached grid. vectors are computed with field_function
+        if they are None. key is (window size, spacing of points).
+        """
+        if vectors is None:
+            vectors = self.field_function(points)
+        self._grid_points = points
+        self._grid_vectors = vectors
+        self._grid_drift = zeros(len(points))
+        self._grid_key = key
+        self._grid_spacing = key[1]
+        self._grid_version += 1
+
+    def _refine(self, key: tuple) -> None:
+        """
+        Starts a RefinementJob for the levels finer than the cached grid,
+        unless one is already running, and waits up to REFINEMENT_WAIT
+        seconds for it so that small grids are drawn at once.
+        """
+        size, spacing = key
+        if self._grid_key is not None and (
+            self._grid_key[0] != size or self._grid_key[1] <= spacing
+        ):
+            # Only a coarser grid of the same size is worth keeping until
+            # the job replaces it.
+            self._grid_key = self._grid_points = self._grid_vectors = None
+        if self._refinement is not None and self._refinement.key != key:
+            self._cancel_refinement()
+        if self._refinement is None:
+            spacings = sorted(
+                {spacing * level for level in self.refinement_levels} | {spacing},
+                reverse=True,
+            )
+            if self._grid_key is not None:
+                spacings = [step for step in spacings if step < self._grid_key[1]]
+            levels = [(step, self._get_grid_points(step)) for step in spacings]
+            # The first call to a backend may compile or calibrate it, which
+            # has to happen on this thread: numba's threading layer hangs at
+            # exit when it is first started by another one.
+            self.field_function(levels[0][1][:1])
+            self._refinement = RefinementJob(self.field_function, levels, key)
+            self._refinement.start()
+            self._refinement.wait(Field.REFINEMENT_WAIT)
+        self.collect_refinement()
+
+    def collect_refinement(self) -> bool:
+        """
+        Swaps in the finest level the background job finished since the
+        last call. Returns True if the grid changed.
+        """
+        job = self._refinement
+        if job is None:
+            return False
+        done = job.done()
+        results = job.results()
+        if done:
+            self._refinement = None
+        if not results:
+            return False
+        spacing, points, vectors = results[-1]
+        self._set_grid((job.key[0], spacing), points, vectors)
+        return True
+
+    def is_refining(self) -> bool:
+        return self._refinement is not None
+
+    def _cancel_refinement(self) -> None:
+        if self._refinement is not None:
+            self._refinement.cancel()
+            self._refinement = None
+
+    def add_source(self, position: ndarray, charge: float) -> None:
+        """
+        Adds the field of a new charge to the cached grid. The field is
+        linear in the charges, so this is O(M) instead of O(M * N).
+        """
+        self._update_grid(position, charge)
+        self._restricted_mask.add(position)
+        self._mask_version += 1
+
+    def remove_source(self, position: ndarray, charge: float) -> None:
+        """Subtracts the field of a removed charge from the cached grid."""
+        self._update_grid(position, -charge)
+        self._restricted_mask.remove(position)
+        self._mask_version += 1
+
+    def invalidate(self) -> None:
+        """
+        Drops the cached grid and restricted points mask so that they are
+        fully computed again.
+        """
+        self._grid_key = None
+        self._restricted_mask.invalidate()
+        self._cancel_refinement()
+
+    def _update_grid(self, position: ndarray, charge: float) -> None:
+        # A running job computes the old charges: the levels it has not
+        # finished are started again by the next get_grid_field.
+        self._cancel_refinement()
+        if self._grid_key is None:
+            return
+        delta = self.backend.electric_field(
+            array([position], dtype=float), array([charge]), self._grid_points
+        )
+        self._grid_vectors += delta
+        self._grid_drift += norm(delta, axis=1)
+        self._grid_version += 1
+
+        # Every addition may be off by one rounding error of its operands,
+        # so the absolute error of a cell is bounded by eps times the sum of
+        # the norms added to it.
+        norms = norm(self._grid_vectors, axis=1)
+        tolerance = self._get_drift_tolerance()
+        min_norm = norms.max() * tolerance
+        error = finfo(self._grid_vectors.dtype).eps * self._grid_drift
+        if (error > tolerance * maximum(norms, min_norm)).any():
+            self.invalidate()
+
+    def interpolate(self, point: tuple) -> ndarray:
+        """
+        Returns the field at point (x, y) interpolated bilinearly from the
+        cached grid, or None if there is no grid for the current window,
+        the point is out of it or the field changes between the corners of
+        its cell (near a charge) more than INTERPOLATION_TOLERANCE, measured
+        as QuadtreeSampler measures the variation of its cells.
+        """
+        if self._grid_key is None or self._grid_key[0] != self._window.get_size():
+            return None
+        spacing = self._grid_spacing
+        columns, rows = self._get_grid_shape(spacing)
+        x, y = point[0] / spacing, point[1] / spacing
+        column, row = floor(x), floor(y)
+        if not (0 <= column < columns - 1 and 0 <= row < rows - 1):
+            return None
+        first = column * rows + row
+        corners = self._grid_vectors[[first, first + rows, first + 1, first + rows + 1]]
+        variation = get_variation(corners[None])[0]
+        if variation > Field.INTERPOLATION_TOLERANCE:
+            return None
+        dx, dy = x - column, y - row
+        weights = array([(1 - dx) * (1 - dy), dx * (1 - dy), (1 - dx) * dy, dx * dy])
+        return weights @ corners
+
+    def _get_drift_tolerance(self) -> float:
+        """
+        Returns the relative error the cached grid may accumulate. A single
+        precision grid gets a looser tolerance, since its rounding error is
+        already above DRIFT_TOLERANCE after one addition.
+        """
+        if self._grid_vectors.dtype == float32:
+            return Field.SINGLE_PRECISION_DRIFT_TOLERANCE
+        return Field.DRIFT_TOLERANCE
 
     @staticmethod
-    def get_greatest_norm(field: list[dict]) -> float:
-        return norm(Field.get_sorted_field_vectors(field)[0])
-
-    def draw(self, restricted_points: list[ndarray]) -> None:
-        field = self._get_field(restricted_points)
-        greatest_norm = Field.get_greatest_norm(field)
-        red_blue_color_generator = colors.RedBlueColorGenerator(greatest_norm)
-        for d in field:
-            self.vector_painter.draw(
-                d["position"],
-                d["vector"],
-                red_blue_color_generator.get_color(norm(d["vector"]), self.brightness),
+    def get_greatest_norm(vectors: ndarray) -> float:
+        if not len(vectors):
+            return 0.0
+        return norm(vectors, axis=1).max()
+
+    def _get_atlas(self) -> ArrowAtlas:
+        """
+        Returns the arrow atlas for the current brightness, color map and
+        arrows scale, building it again only when one of them changes.
+        """
+        key = (self.brightness, self.color_map, self.vector_painter.scale_factor)
+        if self._atlas_key != key:
+            self._atlas = ArrowAtlas(
+                self.vector_painter, self.color_map, self.brightness
+            )
+            self._atlas_key = key
+        return self._atlas
+
+    def draw(self, restricted_points: ndarray) -> None:
+        self._update_render_cache(restricted_points)
+        if not self._greatest_norm:
+            return
+        drawn = self._norms > 0
+        self._get_atlas().draw(
+            self._window,
+            self._positions[drawn],
+            self._vectors[drawn],
+            self._norms[drawn] / self._greatest_norm,
+        )
+
+
+class AdaptiveField(Field):
+    MIN_SPACING_FACTOR = 2
+    DEPTH = 3
+
+    def __init__(
+        self,
+        window: pygame.Surface,
+        brightness: int,
+        field_function: Callable,
+        space_between_vectors: int,
+        backend=None,
+        budget: int = None,
+    ) -> None:
+        """
+        An AdaptiveField instance draws the field vectors at the samples of
+        a QuadtreeSampler instead of on a uniform grid: from 4 times
+        space_between_vectors apart where the field is smooth down to half
+        of it near the charges.
+
+        budget is the greatest number of field evaluations, by default the
+        number of points of the uniform grid of space_between_vectors, so
+        the field costs the same to compute as a Field. The samples depend
+        on every charge, so adding or removing one samples the field again.
+        """
+        super().__init__(
+            window, brightness, field_function, space_between_vectors, backend
+        )
+        self.budget = budget
+        self.sampler = QuadtreeSampler(
+            max(space_between_vectors // AdaptiveField.MIN_SPACING_FACTOR, 1),
+            AdaptiveField.DEPTH,
+        )
+
+    def get_grid_field(self) -> tuple[ndarray, ndarray]:
+        """
+        Returns the sample positions and the field vector at each of them.
+        Cells inside the charges are only left unrefined once the restricted
+        points mask was built by drawing the field.
+        """
+        key = (self._window.get_size(), self.space_between_vectors)
+        if self._grid_key != key:
+            size = self._window.get_size()
+            restricted = None
+            if self._restricted_mask.key == self._get_mask_key():
+                restricted = self._restricted_mask.mask.reshape(
+                    self.sampler.get_lattice_shape(size)
+                )
+            budget = self.budget or len(self._get_grid_points())
+            points, vectors = self.sampler.sample(
+                size, self.field_function, budget, restricted
             )
+            self._set_grid(key, points, vectors)
+        return self._grid_points, self._grid_vectors
+
+    def _get_mask_key(self) -> tuple:
+        shape = self.sampler.get_lattice_shape(self._window.get_size())
+        return shape, self.sampler.min_spacing
+
+    def _update_grid(self, position: ndarray, charge: float) -> None:
+        self._grid_key = None
+
+    def interpolate(self, point: tuple) -> ndarray:
+        """The samples are not on a grid: the field is never interpolated."""
+        return None
+
+    def _update_render_cache(self, restricted_points: ndarray) -> None:
+        """
+        Computes the samples to draw like Field does. The restricted points
+        mask is built on the sampler lattice, before sampling.
+        """
+        mask_key = self._get_mask_key()
+        if self._restricted_mask.key != mask_key:
+            self._restricted_mask.build(*mask_key, restricted_points)
+            self._mask_version += 1
+            self._grid_key = None
+        points, vectors = self.get_grid_field()
+
+        version = (self._grid_version, self._mask_version)
+        if self._render_version == version:
+            return
+        columns, rows = mask_key[0]
+        keys = rint(points / self.sampler.min_spacing).astype(int64)
+        restricted = self._restricted_mask.mask[keys[:, 0] * rows + keys[:, 1]]
+        drawn = ~restricted & isfinite(vectors).all(axis=1)
+        self._positions = points[drawn]
+        self._vectors = vectors[drawn]
+        self._norms = norm(self._vectors, axis=1)
+        self._greatest_norm = self._norms.max() if len(self._norms) else 0.0
+        self._render_version = version
+
+
+class Heatmap(Field):
+    LOOKUP_TABLE_SIZE = 256
+    LOW_PERCENTILE = 1
+    HIGH_PERCENTILE = 99.5
+
+    def __init__(
+        self,
+        window: pygame.Surface,
+        brightness: int,
+        field_function: Callable,
+        pixel_step: int,
+        backend=None,
+        refinement_levels: tuple = None,
+    ) -> None:
+        """
+        A Heatmap instance paints the norm of the field on every pixel
+        (pixel_step = 1) or every other pixel (pixel_step = 2) of the window.
+
+        The field grid is the same cached grid Field uses for its vectors,
+        with pixel_step as the space between samples, so it is evaluated
+        with the batched field_function and updated incrementally when
+        charges are added or removed. log10 of the norm is mapped between
+        the LOW_PERCENTILE and HIGH_PERCENTILE of the grid to an index of a
+        color lookup table, so coloring the whole window is a single numpy
+        indexing operation.
+        """
+        super().__init__(
+            window, brightness, field_function, pixel_step, backend, refinement_levels
+        )
+        self._lookup_table = None
+        self._lookup_table_key = None
+        self._indices = None
+
+    def _get_lookup_table(self) -> ndarray:
+        key = (self.brightness, self.color_map)
+        if self._lookup_table_key != key:
+            values = linspace(0, 1, Heatmap.LOOKUP_TABLE_SIZE)
+            table = self.color_map(1.0).get_colors(values, self.brightness)
+            self._lookup_table = clip(rint(table), 0, 255).astype(uint8)
+            self._lookup_table_key = key
+        return self._lookup_table
+
+    def _update_indices(self) -> None:
+        """
+        Computes the lookup table index of every sample from the raw field.
+        """
+        points, vectors = self.get_grid_field()
+        if points is None:
+            self._indices = None
+            return
+        if self._render_version == self._grid_version:
+            return
+        norms = norm(vectors, axis=1)
+        log_norms = log10(maximum(norms, finfo(norms.dtype).tiny))
+        low, high = percentile(
+            log_norms, (Heatmap.LOW_PERCENTILE, Heatmap.HIGH_PERCENTILE)
+        )
+        scale = (Heatmap.LOOKUP_TABLE_SIZE - 1) / max(high - low, finfo(float).eps)
+        indices = clip((log_norms - low) * scale, 0, Heatmap.LOOKUP_TABLE_SIZE - 1)
+        self._indices = indices.astype(uint8).reshape(
+            self._get_grid_shape(self._grid_spacing)
+        )
+        self._render_version = self._grid_version
+
+    def draw(self, restricted_points: ndarray = None) -> None:
+        self._update_indices()
+        if self._indices is None:
+            return
+        pixels = self._get_lookup_table()[self._indices]
+        if self._grid_spacing > 1:
+            pixels = pixels.repeat(self._grid_spacing, axis=0)
+            pixels = pixels.repeat(self._grid_spacing, axis=1)
+        w, h = self._window.get_size()
+        pygame.surfarray.blit_array(self._window, pixels[:w, :h])
+
+
+class FieldLines:
+    def __init__(
+        self,
+        window: pygame.Surface,
+        brightness: int,
+        charge_distribution: ChargeDistribution,
+        tracer: FieldLineTracer,
+    ) -> None:
+        """
+        A FieldLines instance draws the field lines of the charges of
+        charge_distribution, traced by tracer with the solver of the
+        distribution.
+
+        The lines are traced again only when the charges or the size of
+        the window change, on a background TracingJob, so adding or
+        removing charges never waits for them. Until the job finishes the
+        last lines traced are drawn, and charges changed while a job runs
+        are traced by the next one. Drawing the lines again is a single
+        antialiased polyline per line.
+        """
+        self._window = window
+        self.brightness = brightness
+        self.charge_distribution = charge_distribution
+        self.tracer = tracer
+        self._lines = []
+        self._key = None
+        self._job = None
+
+    def _get_key(self) -> tuple:
+        return (
+            self.charge_distribution,
+            self.charge_distribution.version,
+            self._window.get_size(),
+        )
+
+    def trace(self) -> list[ndarray]:
+        """
+        Returns the last field lines traced, starting a TracingJob if the
+        charges or the window changed since.
+        """
+        key = self._get_key()
+        # A job for charges that only changed since is let finish, so that
+        # the lines keep up while charges are added one after the other.
+        if self._job is not None and (
+            self._job.key[0] is not key[0] or self._job.key[2] != key[2]
+        ):
+            self._job.cancel()
+            self._job = None
+        if self._key != key and self._job is None:
+            solver = self.charge_distribution.solver
+            positions = self.charge_distribution.positions
+            charges = self.charge_distribution.charges
+            if len(charges):
+                # The first call to a backend may compile or calibrate it,
+                # which has to happen on this thread (see Field._refine).
+                solver.electric_field(positions, charges, zeros((1, 2)))
+            self._job = TracingJob(
+                self.tracer,
+                solver.electric_field,
+                positions,
+                charges,
+                self._window.get_size(),
+                key,
+            )
+            self._job.start()
+        self.collect()
+        return self._lines
+
+    def collect(self) -> bool:
+        """
+        Swaps in the lines of the background job if it finished since the
+        last call. Returns True if the lines changed.
+        """
+        job = self._job
+        if job is None or not job.done():
+            return False
+        self._job = None
+        results = job.results()
+        if not results:
+            return False
+        self._lines = results[-1]
+        self._key = job.key
+        return True
+
+    def is_tracing(self) -> bool:
+        return self._job is not None
+
+    def draw(self) -> None:
+        color = (self.brightness,) * 3
+        for line in self._lines:
+            pygame.draw.aalines(self._window, color, False, line.tolist())
 
 
 class Vector:
@@ -349,9 +1147,16 @@ class Vector:
         vector: tuple,
         radius: int,
         color: tuple,
-    ) -> None:
-        """Draws a vector at the given position."""
-        vector_norm = (vector[0] ** 2 + vector[1] ** 2) ** (1 / 2)
+    ) -> pygame.Rect:
+        """Draws a vector at the given position and returns the rect drawn."""
+        # float32 forces and fields are around 1e-33, so their squares
+        # would underflow.
+        vector = (float(vector[0]), float(vector[1]))
+        vector_norm = Vector.get_norm(vector)
+        if vector_norm == 0:
+            # Without a field there is no direction to draw.
+            self.last_end_point = position
+            return pygame.Rect(position, (0, 0))
         unit_vector = [vector[0] / vector_norm, vector[1] / vector_norm]
 
         if self.minimum_vector_norm:
@@ -370,10 +1175,10 @@ class Vector:
             start_point[1] + vector[1] * self.scale_factor,
         )
 
-        pygame.draw.line(
+        rect = pygame.draw.line(
             self._window, color, start_point, end_point, Vector.DEFAULT_VECTOR_WIDTH
         )
-        self._draw_vector_head(
+        head_rect = self._draw_vector_head(
             vector,
             end_point,
             color,
@@ -381,10 +1186,11 @@ class Vector:
             Vector.DEFAULT_VECTOR_WIDTH,
         )
         self.last_end_point = end_point
+        return rect.union(head_rect)
 
     def _draw_vector_head(
         self, vector, vector_end_point, color, head_length, head_width
-    ):
+    ) -> pygame.Rect:
         vector_angle = Vector.get_angle(vector)
         if vector[1] < 0:
             vector_angle *= -1
@@ -398,7 +1204,7 @@ class Vector:
             vector_end_point[1] + left_head_vector[1],
         )
 
-        pygame.draw.line(
+        left_rect = pygame.draw.line(
             self._window,
             color,
             vector_end_point,
@@ -415,21 +1221,25 @@ class Vector:
             vector_end_point[1] + right_head_vector[1],
         )
 
-        pygame.draw.line(
+        right_rect = pygame.draw.line(
             self._window,
             color,
             vector_end_point,
             right_head_endpoint,
             head_width,
         )
+        return left_rect.union(right_rect)
 
     @staticmethod
     def get_norm(vector):
-        return sqrt(vector[0] ** 2 + vector[1] ** 2)
+        return hypot(float(vector[0]), float(vector[1]))
 
     @staticmethod
     def get_angle(vector):
-        return acos(vector[0] / Vector.get_norm(vector))
+        vector_norm = Vector.get_norm(vector)
+        if vector_norm == 0:
+            return 0.0
+        return acos(vector[0] / vector_norm)
 
 
 class ColoredVector(Vector):
@@ -451,7 +1261,10 @@ class ColoredVector(Vector):
 
     def draw(self, position: tuple, vector: tuple, color: tuple) -> None:
         """Draws a unit vector scaled by scale_factor at the given position."""
-        vector_norm = (vector[0] ** 2 + vector[1] ** 2) ** (1 / 2)
+        vector = (float(vector[0]), float(vector[1]))
+        vector_norm = Vector.get_norm(vector)
+        if vector_norm == 0:
+            return
         unit_vector = [vector[0] / vector_norm, vector[1] / vector_norm]
 
         end_point = [
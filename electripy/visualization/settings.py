@@ -3,12 +3,44 @@ HEIGHT = 750
 WIDTH = 750
 RESIZABLE = True
 FPS = 40
+IDLE_TIMEOUT = 250  # milliseconds the main loop blocks when idle
 DEFAULT_FORCE_VECTOR_SCALE_FACTOR = 22e32
 DEFAULT_EF_VECTOR_SCALE_FACTOR = 2e14
 DEFAULT_EF_BRIGHTNESS = 105
 DEFAULT_SPACE_BETWEEN_EF_VECTORS = 20
 MINIMUM_FORCE_VECTOR_NORM = 10
 MINIMUM_ELECTRIC_FIELD_VECTOR_NORM = 15
+HEATMAP_PIXEL_STEP = 2
+
+# Field lines started around each charge, and in all when there are many
+# charges (see FieldLineTracer).
+FIELD_LINES_PER_CHARGE = 12
+MAX_FIELD_LINES = 300
+
+# The field grids are computed in the background at these multiples of their
+# spacing, coarsest first, and each level is drawn as soon as it is finished.
+# None computes them at once, blocking the main loop.
+FIELD_REFINEMENT_LEVELS = (4, 2, 1)
+
+# Draw the field vectors on an adaptive quadtree, denser near the charges,
+# instead of on a uniform grid, for the same number of field evaluations.
+ADAPTIVE_FIELD_SAMPLING = False
+
+# Compute the field vector at the mouse position from every charge instead
+# of interpolating it from the field grids where they are smooth enough.
+EXACT_FIELD_PROBE = False
+
+# Precision of the field computations and caches, "float64" or "float32".
+# Single precision halves the memory traffic of the field grids.
+PRECISION = "float64"
+
+# Solver used for fields and forces: "direct", "barnes-hut", "fmm" or
+# "parallel", created with SOLVER_OPTIONS as keyword arguments. The direct
+# solver takes a "backend" option (see electripy.physics.backends) and runs
+# on the screen's backend by default. PRECISION only applies to the direct
+# and parallel solvers: "barnes-hut" and "fmm" always compute in float64.
+SOLVER = "direct"
+SOLVER_OPTIONS = {}
 
 KEYS = {
     "clear_screen": "r",
@@ -16,15 +48,26 @@ KEYS = {
     "show_electric_forces_vectors": "f",
     "show_electric_field_at_mouse_position": "m",
     "show_electric_field": "e",
+    "show_electric_field_heatmap": "h",
+    "show_field_lines": "l",
+    "show_frame_times": "p",
     "increment_electric_field_brightness": "+",
     "decrement_electric_field_brightness": "-",
     "remove_last_charge_added": "z",
     "add_last_charge_removed": "y",
+    "save_scene": "s",
+    "load_scene": "o",
 }
 
+# Scene file saved with CTRL + S and loaded with CTRL + O (see
+# electripy.physics.scenes for the formats).
+SCENE_PATH = "electripy-scene.npz"
+
 # Text settings:
 CHARGES_SIGN_FONT = "Arial"
 PROTON_SIGN_FONT_SIZE = 23
 ELECTRON_SIGN_FONT_SIZE = 35
 VECTOR_COMPONENTS_FONT = "Arial"
 VECTOR_COMPONENTS_FONT_SIZE = 13
+FRAME_TIMES_FONT = "Courier New"
+FRAME_TIMES_FONT_SIZE = 13
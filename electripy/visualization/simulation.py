@@ -1,5 +1,6 @@
+import os
 import pygame
-from electripy.visualization import settings, colors
+from electripy.visualization import settings, colors, profiling
 from electripy.visualization.screen import Screen
 from electripy.physics.charges import Proton, Electron
 from numpy import array
@@ -9,96 +10,175 @@ LEFT = 1
 RIGHT = 3
 
 
-def start_simulation(screen: Screen, clock: pygame.time.Clock) -> None:
-    while True:
+def start_simulation(
+    screen: Screen, clock: pygame.time.Clock, max_frames: int = None
+) -> None:
+    """
+    Runs the main loop. Every frame drains the pending events, applies them
+    as state changes of the screen and then renders at most once, so a
+    burst of events (mouse motion, for instance) costs a single redraw.
+    When nothing has to be drawn the loop blocks on pygame.event.wait
+    instead of waking up FPS times per second.
+
+    The sounds are loaded once the first frame is on screen. If max_frames
+    is given the loop returns after that many frames, idle ones included
+    (the first frame is always drawn).
+    """
+    frame_timer = screen.frame_timer
+    frames = 0
+    screen.request_refresh()
+    while max_frames is None or frames < max_frames:
+        frames += 1
+        if frames == 2:
+            screen.load_sounds()
+            screen.start_calibration()
         clock.tick(settings.FPS)
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                return
-
+        screen.update_fields()
+        if screen.showing_frame_times:
+            screen.request_refresh(overlays_only=True)
+        events = get_events(screen)
+        if not events and not screen.has_pending_refresh():
+            continue
+
+        frame_timer.start_frame()
+        with frame_timer.phase("events"):
+            for event in events:
+                if event.type == pygame.QUIT:
+                    return
+                handle_event(screen, event)
             if screen.has_been_resized():
                 screen.clear_electric_field_copy()
-                screen.refresh_screen()
-
-            # Mouse click events:
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                mx, my = event.pos
-                position = array([mx, my])
-                if event.button == LEFT:
-                    charge = Proton(position)
-                elif event.button == RIGHT:
-                    charge = Electron(position)
-                else:
-                    continue
-                screen.add_charge(charge, True)
-
-            # Key down events:
-            screen_state_changed = True
-            if event.type == pygame.KEYDOWN:
-                key_pressed = pygame.key.name(event.key)
-                mods = pygame.key.get_mods()
-
-                """Action keys"""
-                # Key down combinations:
-                if (
-                    mods & pygame.KMOD_CTRL
-                    and key_pressed == settings.KEYS["remove_last_charge_added"]
-                ):  # CTRL + remove_last_charge_added key
-                    screen.remove_last_charge_added()
-                    continue
-                if (
-                    mods & pygame.KMOD_CTRL
-                    and key_pressed == settings.KEYS["add_last_charge_removed"]
-                ):  # CTRL + add_last_charge_removed key
-                    screen.add_last_charge_removed()
-                    continue
-
-                # Single key down:
-                if key_pressed == settings.KEYS["increment_electric_field_brightness"]:
-                    screen.increment_electric_field_brightness()
-
-                if key_pressed == settings.KEYS["decrement_electric_field_brightness"]:
-                    screen.decrement_electric_field_brightness()
-
-                if key_pressed == settings.KEYS["clear_screen"]:
-                    screen.clear()
-                    continue
-
-                """ State keys: """
-                # Single key down:
-                if key_pressed == settings.KEYS["show_vector_components"]:
-                    screen.showing_vectors_components = (
-                        not screen.showing_vectors_components
-                    )
-
-                elif key_pressed == settings.KEYS["show_electric_forces_vectors"]:
-                    screen.showing_electric_forces_vectors = (
-                        not screen.showing_electric_forces_vectors
-                    )
-
-                elif (
-                    key_pressed
-                    == settings.KEYS["show_electric_field_at_mouse_position"]
-                ):
-                    screen.showing_electric_field_at_mouse_position = (
-                        not screen.showing_electric_field_at_mouse_position
-                    )
-
-                elif key_pressed == settings.KEYS["show_electric_field"]:
-                    screen.showing_electric_field = not screen.showing_electric_field
-
-            else:
-                screen_state_changed = False
-
-            if screen_state_changed or screen.showing_electric_field_at_mouse_position:
-                mx, my = pygame.mouse.get_pos()
-                screen.refresh_screen(mx, my)
-
-        pygame.display.update()
-
-
-def main() -> None:
-    pygame.init()
+                screen.request_refresh()
+
+        mx, my = pygame.mouse.get_pos()
+        screen.render(mx, my)
+        with frame_timer.phase("display"):
+            screen.update_display()
+        frame_timer.end_frame()
+
+
+def get_events(screen: Screen) -> list[pygame.event.Event]:
+    """
+    Returns the pending events. If there are none, the screen has nothing
+    to draw and no field is being computed in the background, waits up to
+    settings.IDLE_TIMEOUT milliseconds for the next one.
+    """
+    events = pygame.event.get()
+    if events or screen.has_pending_refresh() or screen.is_refining_fields():
+        return events
+    event = pygame.event.wait(settings.IDLE_TIMEOUT)
+    if event.type == pygame.NOEVENT:
+        return []
+    return [event] + pygame.event.get()
+
+
+def handle_event(screen: Screen, event: pygame.event.Event) -> None:
+    """Applies an event to the screen and requests the redraw it needs."""
+    # Mouse click events:
+    if event.type == pygame.MOUSEBUTTONDOWN:
+        mx, my = event.pos
+        position = array([mx, my])
+        if event.button == LEFT:
+            charge = Proton(position)
+        elif event.button == RIGHT:
+            charge = Electron(position)
+        else:
+            return
+        screen.add_charge(charge, True)
+
+    # Key down events:
+    screen_state_changed = True
+    if event.type == pygame.KEYDOWN:
+        key_pressed = pygame.key.name(event.key)
+        mods = pygame.key.get_mods()
+
+        """Action keys"""
+        # Key down combinations:
+        if (
+            mods & pygame.KMOD_CTRL
+            and key_pressed == settings.KEYS["remove_last_charge_added"]
+        ):  # CTRL + remove_last_charge_added key
+            screen.remove_last_charge_added()
+            return
+        if (
+            mods & pygame.KMOD_CTRL
+            and key_pressed == settings.KEYS["add_last_charge_removed"]
+        ):  # CTRL + add_last_charge_removed key
+            screen.add_last_charge_removed()
+            return
+        if mods & pygame.KMOD_CTRL and key_pressed == settings.KEYS["save_scene"]:
+            screen.save_scene(settings.SCENE_PATH)
+            return
+        if mods & pygame.KMOD_CTRL and key_pressed == settings.KEYS["load_scene"]:
+            if os.path.exists(settings.SCENE_PATH):
+                screen.load_scene(settings.SCENE_PATH)
+            return
+
+        # Single key down:
+        if key_pressed == settings.KEYS["increment_electric_field_brightness"]:
+            screen.increment_electric_field_brightness()
+
+        if key_pressed == settings.KEYS["decrement_electric_field_brightness"]:
+            screen.decrement_electric_field_brightness()
+
+        if key_pressed == settings.KEYS["clear_screen"]:
+            screen.clear()
+            return
+
+        """ State keys: """
+        # Single key down:
+        if key_pressed == settings.KEYS["show_vector_components"]:
+            screen.showing_vectors_components = not screen.showing_vectors_components
+
+        elif key_pressed == settings.KEYS["show_electric_forces_vectors"]:
+            screen.showing_electric_forces_vectors = (
+                not screen.showing_electric_forces_vectors
+            )
+
+        elif key_pressed == settings.KEYS["show_electric_field_at_mouse_position"]:
+            screen.showing_electric_field_at_mouse_position = (
+                not screen.showing_electric_field_at_mouse_position
+            )
+
+        elif key_pressed == settings.KEYS["show_electric_field"]:
+            screen.showing_electric_field = not screen.showing_electric_field
+            screen.clear_electric_field_copy()
+
+        elif key_pressed == settings.KEYS["show_electric_field_heatmap"]:
+            screen.showing_electric_field_heatmap = (
+                not screen.showing_electric_field_heatmap
+            )
+            screen.clear_electric_field_copy()
+
+        elif key_pressed == settings.KEYS["show_field_lines"]:
+            screen.showing_field_lines = not screen.showing_field_lines
+            screen.clear_electric_field_copy()
+
+        elif key_pressed == settings.KEYS["show_frame_times"]:
+            screen.showing_frame_times = not screen.showing_frame_times
+
+    else:
+        screen_state_changed = False
+
+    if screen_state_changed:
+        screen.request_refresh()
+    elif screen.showing_electric_field_at_mouse_position:
+        screen.request_refresh(overlays_only=True)
+
+
+def main(
+    profile_directory: str = None, max_frames: int = None, scene_path: str = None
+) -> None:
+    """
+    Runs the simulation. If profile_directory is given the session runs
+    under cProfile and tracemalloc, and their reports and the frame times
+    are written to that directory when the window is closed. If max_frames
+    is given the simulation quits after that many frames. If scene_path is
+    given the simulation starts with the charges of that scene file.
+    """
+    # The mixer is initialized by the sounds when they are first loaded.
+    pygame.display.init()
+    pygame.font.init()
     # Screen setup
     screen = Screen(
         settings.WINDOW_TITLE,
@@ -107,10 +187,19 @@ def main() -> None:
         settings.RESIZABLE,
         colors.BLACK,
     )
+    if scene_path is not None:
+        screen.load_scene(scene_path)
 
     # Start animation
     clock = pygame.time.Clock()
-    start_simulation(screen, clock)
+    if profile_directory is None:
+        start_simulation(screen, clock, max_frames)
+    else:
+        profiling.profile_session(
+            lambda: start_simulation(screen, clock, max_frames), profile_directory
+        )
+        screen.frame_timer.to_csv(os.path.join(profile_directory, "frame_times.csv"))
+        screen.frame_timer.to_json(os.path.join(profile_directory, "frame_times.json"))
     pygame.quit()
 
 
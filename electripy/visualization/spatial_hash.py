@@ -0,0 +1,79 @@
+from numpy import ndarray, asarray, zeros, arange, meshgrid, rint, int64, add
+from math import ceil
+
+
+class SpatialHashMask:
+    MAX_CHARGES_PER_BATCH = 65536
+
+    def __init__(self, radius: float) -> None:
+        """
+        A SpatialHashMask instance tells which points of a uniform grid are
+        within radius of at least one charge.
+
+        Each charge is hashed to the grid cell nearest to it, and only the
+        cells of the small stencil around it (the ones that can be within
+        radius) are tested. The mask keeps, for every grid point, how many
+        charges cover it, so adding or removing one charge only touches its
+        stencil.
+        """
+        self.radius = radius
+        self.key = None
+        self._counts = None
+        self._spacing = None
+
+    def build(self, shape: tuple, spacing: int, positions: ndarray) -> None:
+        """
+        Builds the mask of a grid of shape (columns, rows) with a point
+        every spacing pixels, covered by the charges at positions.
+        """
+        self._counts = zeros(shape, dtype=int64)
+        self._spacing = spacing
+        self.key = (shape, spacing)
+        positions = asarray(positions, dtype=float).reshape(-1, 2)
+        for start in range(0, len(positions), SpatialHashMask.MAX_CHARGES_PER_BATCH):
+            batch = positions[start : start + SpatialHashMask.MAX_CHARGES_PER_BATCH]
+            self._stamp(batch, 1)
+
+    def add(self, position: ndarray) -> None:
+        self._stamp(asarray(position, dtype=float).reshape(1, 2), 1)
+
+    def remove(self, position: ndarray) -> None:
+        self._stamp(asarray(position, dtype=float).reshape(1, 2), -1)
+
+    def invalidate(self) -> None:
+        self.key = None
+
+    @property
+    def mask(self) -> ndarray:
+        """
+        Flat boolean array, in the order of Field grid points, which is True
+        for every grid point covered by a charge.
+        """
+        return (self._counts > 0).ravel()
+
+    def _stamp(self, positions: ndarray, increment: int) -> None:
+        """
+        Adds increment to the count of every grid point within radius of
+        each position.
+        """
+        if self.key is None or not len(positions):
+            return
+        reach = ceil(self.radius / self._spacing) + 1
+        steps = arange(-reach, reach + 1)
+        offsets_x, offsets_y = meshgrid(steps, steps, indexing="ij")
+
+        cells = rint(positions / self._spacing).astype(int64)
+        columns = cells[:, 0, None] + offsets_x.ravel()
+        rows = cells[:, 1, None] + offsets_y.ravel()
+        distances_squared = (columns * self._spacing - positions[:, 0, None]) ** 2 + (
+            rows * self._spacing - positions[:, 1, None]
+        ) ** 2
+        width, height = self._counts.shape
+        inside = (
+            (columns >= 0)
+            & (columns < width)
+            & (rows >= 0)
+            & (rows < height)
+            & (distances_squared <= self.radius**2)
+        )
+        add.at(self._counts, (columns[inside], rows[inside]), increment)
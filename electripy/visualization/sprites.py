@@ -0,0 +1,148 @@
+from numpy import ndarray, arange, arctan2, rint, clip, cos, sin, pi, int64
+import pygame
+from collections import OrderedDict
+
+
+class ArrowAtlas:
+    ANGLES = 64
+    COLOR_BUCKETS = 32
+
+    def __init__(self, vector_painter, color_map, brightness: int) -> None:
+        """
+        An ArrowAtlas instance is a single surface holding one pre-rendered
+        arrow for every pair of (quantized angle, color bucket). The arrows
+        are drawn once with vector_painter (a ColoredVector) so they look
+        exactly like the ones it draws, and the whole field is then drawn
+        with a single Surface.blits call.
+
+        color_map is a color generator class such as RedBlueColorGenerator.
+        Bucket b holds the color of the normalized value
+        b / (COLOR_BUCKETS - 1).
+        """
+        reach = (
+            vector_painter.scale_factor
+            + vector_painter.DEFAULT_HEAD_LENGTH
+            + vector_painter.DEFAULT_VECTOR_WIDTH
+        )
+        self.cell_size = 2 * int(reach) + 2
+        self.center = self.cell_size // 2
+        self.surface = pygame.Surface(
+            (
+                self.cell_size * ArrowAtlas.ANGLES,
+                self.cell_size * ArrowAtlas.COLOR_BUCKETS,
+            ),
+            pygame.SRCALPHA,
+        )
+        self.surface.fill((0, 0, 0, 0))
+
+        buckets = arange(ArrowAtlas.COLOR_BUCKETS) / (ArrowAtlas.COLOR_BUCKETS - 1)
+        bucket_colors = color_map(1.0).get_colors(buckets, brightness).tolist()
+        atlas_painter = type(vector_painter)(self.surface, vector_painter.scale_factor)
+        for angle_index in range(ArrowAtlas.ANGLES):
+            angle = 2 * pi * angle_index / ArrowAtlas.ANGLES
+            vector = (float(cos(angle)), float(sin(angle)))
+            for bucket, color in enumerate(bucket_colors):
+                position = (
+                    angle_index * self.cell_size + self.center,
+                    bucket * self.cell_size + self.center,
+                )
+                atlas_painter.draw(position, vector, color)
+
+        self.areas = [
+            [
+                pygame.Rect(
+                    angle_index * self.cell_size,
+                    bucket * self.cell_size,
+                    self.cell_size,
+                    self.cell_size,
+                )
+                for bucket in range(ArrowAtlas.COLOR_BUCKETS)
+            ]
+            for angle_index in range(ArrowAtlas.ANGLES)
+        ]
+
+    def draw(
+        self,
+        window: pygame.Surface,
+        positions: ndarray,
+        vectors: ndarray,
+        normalized_norms: ndarray,
+    ) -> None:
+        """
+        Draws an arrow at each position, pointing as its vector and colored
+        by its normalized norm (between 0 and 1).
+        """
+        angles = arctan2(vectors[:, 1], vectors[:, 0])
+        angle_indices = rint(angles * (ArrowAtlas.ANGLES / (2 * pi))).astype(int64)
+        angle_indices %= ArrowAtlas.ANGLES
+        buckets = rint(clip(normalized_norms, 0, 1) * (ArrowAtlas.COLOR_BUCKETS - 1))
+        destinations = (positions - self.center).astype(int64).tolist()
+        areas = self.areas
+        window.blits(
+            [
+                (self.surface, destination, areas[angle_index][bucket])
+                for destination, angle_index, bucket in zip(
+                    destinations, angle_indices.tolist(), buckets.astype(int).tolist()
+                )
+            ],
+            doreturn=False,
+        )
+
+
+class ChargeSprite:
+    def __init__(
+        self,
+        color: tuple,
+        radius: int,
+        sign_surface: pygame.Surface,
+        y_sign_displacement: int,
+    ) -> None:
+        """
+        A ChargeSprite instance is a pre-rendered charge: a circle with its
+        sign on top, placed as Screen used to draw them one by one.
+        """
+        sign_offset = (
+            -(sign_surface.get_width() // 2),
+            -sign_surface.get_width() * y_sign_displacement,
+        )
+        circle_rect = pygame.Rect(-radius, -radius, 2 * radius, 2 * radius)
+        sign_rect = pygame.Rect(sign_offset, sign_surface.get_size())
+        bounds = circle_rect.union(sign_rect)
+
+        self.offset = (bounds.x, bounds.y)
+        self.surface = pygame.Surface(bounds.size, pygame.SRCALPHA)
+        self.surface.fill((0, 0, 0, 0))
+        center = (-bounds.x, -bounds.y)
+        pygame.draw.circle(self.surface, color, center, radius)
+        self.surface.blit(
+            sign_surface, (center[0] + sign_offset[0], center[1] + sign_offset[1])
+        )
+
+
+class LabelCache:
+    MAX_SIZE = 1024
+
+    def __init__(self, font: pygame.font.Font, color: tuple, max_size=MAX_SIZE):
+        """
+        A LabelCache instance keeps the surfaces font rendered for the last
+        max_size texts, so a label is only rendered again when its text
+        changes. The least recently used label is dropped when it is full.
+        """
+        self.font = font
+        self.color = color
+        self.max_size = max_size
+        self._labels = OrderedDict()
+
+    def render(self, text: str) -> pygame.Surface:
+        label = self._labels.get(text)
+        if label is not None:
+            self._labels.move_to_end(text)
+            return label
+        label = self.font.render(text, True, self.color)
+        self._labels[text] = label
+        if len(self._labels) > self.max_size:
+            self._labels.popitem(last=False)
+        return label
+
+    def __len__(self) -> int:
+        return len(self._labels)